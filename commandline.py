@@ -1,23 +1,45 @@
 import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
+from glob import glob
+from typing import List, Optional, Tuple
 from pathlib import Path
 
+TABLE_SUFFIXES = {'.csv', '.tsv', '.tab', '.xlsx', '.xls'}
+
 
 @dataclass
 class FormatParser(argparse.Namespace):
 	# For convienience
-	input: Path
+	input: List[Path]
 	output: Path
 	column: str
 	namespace: Optional[str]
 	fuzzy: int
+	chunksize: Optional[int]
+	jobs: int
 
 	@classmethod
 	def from_parser(cls, parser) -> 'FormatParser':
 
 		output = Path(parser.output) if parser.output else None
-		return cls(Path(parser.input), output, parser.column, parser.namespace, int(parser.fuzzy))
+		chunksize = int(parser.chunksize) if parser.chunksize else None
+		inputs = [path for value in parser.input for path in expand_input_paths(value)]
+		return cls(inputs, output, parser.column, parser.namespace, int(parser.fuzzy), chunksize, int(parser.jobs))
+
+
+def expand_input_paths(value: str) -> List[Path]:
+	""" Converts an `--input` value into a list of tables. The value may be a file, a directory or a glob pattern."""
+	path = Path(value)
+	if path.is_dir():
+		paths = [i for i in path.iterdir() if i.suffix in TABLE_SUFFIXES]
+	elif any(character in value for character in '*?['):
+		paths = [Path(i) for i in glob(value, recursive = True)]
+	else:
+		return [path]
+	# Skip tables written by previous runs.
+	return sorted(i for i in paths if not i.name.endswith('.edited.tsv'))
 
 
 def define_parser() -> argparse.ArgumentParser:
@@ -28,13 +50,14 @@ def define_parser() -> argparse.ArgumentParser:
 	utility_parser = subparsers.add_parser('format', help = "Utilities for formatting tables.")
 	utility_parser.add_argument(
 		"-i", "--input",
-		help = "The table to convert.",
+		help = "The table(s) to convert. Accepts files, directories and glob patterns.",
 		action = "store",
-		dest = "input"
+		dest = "input",
+		nargs = '+'
 	)
 	utility_parser.add_argument(
 		"-o", "--output",
-		help = "Name of the new table. defaults to `input`.edited.tsv",
+		help = "Name of the new table. defaults to `input`.edited.tsv. Must be a folder if more than one table is converted.",
 		action = 'store',
 		dest = 'output',
 		default = None
@@ -61,15 +84,86 @@ def define_parser() -> argparse.ArgumentParser:
 		dest = 'fuzzy',
 		default = 0
 	)
+	utility_parser.add_argument(
+		"--chunksize",
+		help = "Converts the table this many rows at a time instead of loading it all into memory. Only works with csv/tsv tables.",
+		action = 'store',
+		dest = 'chunksize',
+		default = None
+	)
+	utility_parser.add_argument(
+		"-j", "--jobs",
+		help = "The number of tables to convert in parallel.",
+		action = 'store',
+		dest = 'jobs',
+		default = 1
+	)
 
 	return parser
 
 
-def utility_workflow(parser: argparse.Namespace):
+def _format_table(parser: FormatParser, filename: Path) -> Tuple[Path, Optional[Path], float, Optional[str]]:
+	"""
+		Converts a single table. Returns the input and output paths, the time taken and the error message, if any.
+		Only errors caused by the table itself (unreadable files, missing columns, bad values) are caught.
+	"""
 	from pyregions.utilities import country_codes
+	start = time.time()
+	try:
+		output = country_codes.convert_table_codes(
+			filename, parser.output, parser.column, parser.namespace, parser.fuzzy, parser.chunksize
+		)
+		error = None
+	except (ValueError, OSError) as exception:
+		output = None
+		error = f"{exception.__class__.__name__}: {exception}"
+	return filename, output, time.time() - start, error
+
+
+def format_tables(parser: FormatParser) -> List[Tuple[Path, Optional[Path], float, Optional[str]]]:
+	""" Converts every input table, using a process pool if more than one job was requested."""
+	from pyregions.utilities import country_codes
+
+	if len(parser.input) > 1 and parser.output is not None:
+		parser.output.mkdir(parents = True, exist_ok = True)
+
+	if parser.jobs <= 1 or len(parser.input) <= 1:
+		return [_format_table(parser, filename) for filename in parser.input]
+
+	# Build the lookup tables once and hand them to each worker rather than having every worker parse them.
+	codes = country_codes.get_country_codes()
+	index = country_codes.get_country_index()
+	with ProcessPoolExecutor(parser.jobs, initializer = country_codes.set_country_codes, initargs = (codes, index)) as pool:
+		futures = [pool.submit(_format_table, parser, filename) for filename in parser.input]
+		return [future.result() for future in futures]
+
+
+def print_summary(results: List[Tuple[Path, Optional[Path], float, Optional[str]]]):
+	width = max((len(str(filename)) for filename, *_ in results), default = 0)
+	for filename, output, duration, error in results:
+		status = f"-> {output}" if error is None else f"FAILED ({error})"
+		print(f"{str(filename):<{width}}  {duration:>8.2f}s  {status}")
+	total = sum(i[2] for i in results)
+	failed = len([i for i in results if i[3] is not None])
+	print(f"Converted {len(results) - failed} of {len(results)} tables ({total:.2f}s of processing time).")
+
+
+def utility_workflow(parser: argparse.Namespace):
+	patterns = parser.input
 	parser = FormatParser.from_parser(parser)
 	print(parser)
-	country_codes.convert_table_codes(parser.input, parser.output, parser.column, parser.namespace, parser.fuzzy)
+	if not parser.input:
+		message = f"No input tables matched {patterns}"
+		raise SystemExit(message)
+	start = time.time()
+	results = format_tables(parser)
+	print_summary(results)
+	print(f"Finished in {time.time() - start:.2f}s")
+
+	failed = [str(filename) for filename, _, _, error in results if error is not None]
+	if failed:
+		message = f"Failed to convert {len(failed)} table(s): {', '.join(failed)}"
+		raise SystemExit(message)
 
 
 if __name__ == "__main__":
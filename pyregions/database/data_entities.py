@@ -0,0 +1,36 @@
+"""
+	Plain containers for entities loaded from the region database. Unlike the database entities, these can be used after
+	the database session has ended.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import pandas
+
+
+@dataclass
+class DataRegion:
+	code: str
+	name: str
+	type: str
+
+
+@dataclass
+class DataSeries:
+	primarykey: Tuple[str, str, str]
+	code: str
+	description: str
+	name: str
+	notes: str
+	region: DataRegion
+	report: Dict[str, Any]
+	scale: str
+	units: str
+	tags: List[str]
+	data: pandas.Series
+
+
+@dataclass
+class DataScale:
+	code: str
+	multiplier: float
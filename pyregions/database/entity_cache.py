@@ -0,0 +1,91 @@
+"""
+	A bounded least-recently-used cache with a separate time-to-live for each kind of entity. Used by the region
+	database to avoid repeating the same lookups.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# The default number of seconds an entry of each kind stays valid. Kinds which are not listed never expire.
+DEFAULT_TTL: Dict[str, float] = {
+	'region': 3600,
+	'scale':  3600,
+	'report': 600,
+	'series': 60
+}
+
+
+class EntityCache:
+	"""
+		Caches lookups by kind and key.
+	Parameters
+	----------
+	maxsize: int; default 4096
+		The maximum number of entries. The least recently used entry is removed when the cache is full.
+	ttl: Optional[Dict[str, float]]
+		The number of seconds an entry of each kind stays valid. Defaults to `DEFAULT_TTL`.
+	clock: Callable[[], float]; default time.monotonic
+	"""
+
+	def __init__(self, maxsize: int = 4096, ttl: Optional[Dict[str, float]] = None,
+			clock: Callable[[], float] = time.monotonic):
+		if maxsize < 1:
+			message = f"The cache size must be at least 1, got {maxsize}"
+			raise ValueError(message)
+		self.maxsize = maxsize
+		self.ttl: Dict[str, float] = dict(DEFAULT_TTL if ttl is None else ttl)
+		self.clock = clock
+
+		self.hits = 0
+		self.misses = 0
+		# Maps (kind, key) to (expiry time, value).
+		self._entries: 'OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]' = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def get(self, kind: str, key: Hashable, validate: Optional[Callable[[Any], bool]] = None) -> Tuple[bool, Any]:
+		"""
+			Looks up an entry.
+		Parameters
+		----------
+		kind: str
+		key: Hashable
+		validate: Optional[Callable[[Any], bool]]
+			Entries for which this returns `False` are removed and counted as a miss.
+
+		Returns
+		-------
+		Tuple[bool, Any]
+			Whether the entry was found, and the cached value.
+		"""
+		entry = self._entries.get((kind, key))
+		if entry is not None:
+			expires, value = entry
+			if expires >= self.clock() and (validate is None or validate(value)):
+				self._entries.move_to_end((kind, key))
+				self.hits += 1
+				return True, value
+			del self._entries[(kind, key)]
+
+		self.misses += 1
+		return False, None
+
+	def set(self, kind: str, key: Hashable, value: Any):
+		ttl = self.ttl.get(kind)
+		expires = self.clock() + ttl if ttl is not None else float('inf')
+		self._entries[(kind, key)] = (expires, value)
+		self._entries.move_to_end((kind, key))
+		if len(self._entries) > self.maxsize:
+			self._entries.popitem(last = False)
+
+	def invalidate(self, *kinds: str):
+		""" Removes every entry of the given kinds, or every entry if no kind is given."""
+		if not kinds:
+			self._entries.clear()
+		else:
+			for item in [item for item in self._entries if item[0] in kinds]:
+				del self._entries[item]
+
+	def info(self) -> Dict[str, int]:
+		return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
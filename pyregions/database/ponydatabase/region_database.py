@@ -1,16 +1,149 @@
+import datetime
+import json
+import math
+import sqlite3
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, List, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from pyregions.dataio import datasets
+import numpy
+import pandas
 from infotools import numbertools
-from pony.orm import db_session, BindingError
+from loguru import logger
+from pony.orm import Database, db_session, commit, flush, select, BindingError
+from pony.orm.core import local
 import importlib
 from pyregions import standard_definition as sd
+from pyregions.database import series_encoding
+from pyregions.database.entity_cache import EntityCache
 from pyregions.database.ponydatabase import sql_entities
 
+# The default maximum number of parameters in a single sqlite statement.
+SQLITE_MAX_VARIABLES = 999
+
+# Raw sql used by the bulk loader. The table and column names are the ones generated by pony for `sql_entities`.
+SQL_INSERT_REGION = 'INSERT INTO "Region" ("code", "name", "type") VALUES (?, ?, ?)'
+SQL_INSERT_REPORT = """INSERT INTO "Report" ("name", "date", "url", "agency") VALUES (?, ?, ?, ?)
+	ON CONFLICT ("name") DO UPDATE SET "date" = excluded."date", "url" = excluded."url", "agency" = excluded."agency"
+"""
+SQL_INSERT_TAG = 'INSERT OR IGNORE INTO "Tag" ("value") VALUES (?)'
+SQL_INSERT_SERIES = """INSERT INTO "Series"
+	("code", "description", "name", "notes", "region", "report", "scale", "units", "years", "values", "packed")
+	VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+SQL_INSERT_OBSERVATION = """INSERT INTO "Observation"
+	("series_report", "series_region", "series_code", "timepoint", "value") VALUES (?, ?, ?, ?, ?)"""
+SQL_INSERT_SERIES_TAG = """INSERT OR IGNORE INTO "Series_Tag"
+	("series_report", "series_region", "series_code", "tag") VALUES (?, ?, ?, ?)"""
+
+
+def _get_columns(connection: sqlite3.Connection, table: str) -> List[str]:
+	return [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _upgrade_schema(filename: str):
+	""" Adds any columns which are missing from a database created by an older version of `sql_entities`."""
+	if filename == ':memory:' or not Path(filename).exists():
+		return
+	connection = sqlite3.connect(filename)
+	try:
+		columns = _get_columns(connection, 'Series')
+		if columns and 'packed' not in columns:
+			logger.info(f"Adding the 'packed' column to the series table of '{filename}'")
+			with connection:
+				connection.execute('ALTER TABLE "Series" ADD COLUMN "packed" BLOB')
+	finally:
+		connection.close()
+
+
+def _decode_series(years: str, values: str, packed: Optional[bytes]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	""" Converts the stored years and values of a series into arrays."""
+	if packed:
+		return series_encoding.unpack_series(packed)
+	return numpy.array(json.loads(years), dtype = int), numpy.array(json.loads(values), dtype = float)
+
+
+def _get_observations(report: str, region: str, code: str, years: List[int], values: List[float]) -> List[Tuple]:
+	""" Returns the rows of the `Observation` table for a single series. Missing values are not stored."""
+	return [(report, region, code, year, value) for year, value in zip(years, values) if value == value]
+
+
+def _unique(values: Iterable[Any]) -> List[Any]:
+	""" Removes duplicate values while keeping the original order."""
+	return list(dict.fromkeys(values))
+
+
+def _chunks(values: List[Any], size: int = SQLITE_MAX_VARIABLES) -> Iterator[List[Any]]:
+	""" Splits a list so that each query stays below sqlite's limit on the number of parameters."""
+	for index in range(0, len(values), size):
+		yield values[index:index + size]
+
+
+def _to_text(value: Any) -> str:
+	""" Optional text fields may be missing (NaN) when they come from a table."""
+	if value is None or (isinstance(value, float) and math.isnan(value)):
+		return ''
+	return str(value)
+
+
+def _to_tags(value: Any) -> List[str]:
+	""" Tags may be given as a list or as a '|'-delimited string."""
+	if isinstance(value, str):
+		return [i for i in value.split('|') if i]
+	if isinstance(value, (list, tuple, set)):
+		return [str(i) for i in value]
+	return []
+
+
+def _to_timestamp(value: Any) -> str:
+	""" Formats a date the same way pony stores datetimes in sqlite."""
+	if not isinstance(value, datetime.datetime):
+		value = datetime.datetime.fromisoformat(str(value))
+	return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _is_session_entity(database: Database, entity: Any) -> bool:
+	"""
+		Checks whether an entity was loaded in the current `db_session`. Pony entities can not be used after the session
+		which loaded them has ended. This relies on pony internals (`Entity._session_cache_` and
+		`Database._get_cache`), which are only used here.
+	"""
+	try:
+		return entity._session_cache_ is database._get_cache()
+	except AttributeError:
+		return False
+
+
+def _encode_array(values: Iterable) -> str:
+	""" Encodes a list of numbers the same way as pony's IntArray/FloatArray attributes."""
+	return json.dumps(list(values), separators = (',', ':'))
+
 
 class BasicRegionDatabase:
-	def __init__(self, filename: Union[str, Path]):
+	"""
+		Wrapper around the pony database.
+	Parameters
+	----------
+	filename: Union[str, Path]
+		The sqlite file to use, or ':memory:'.
+	compact: bool; default False
+		If `True`, imported series are stored as packed binary blobs (see `series_encoding`) rather than as json arrays.
+	cache: Optional[EntityCache]; default None
+		Caches the results of `get_region`, `get_report`, `get_scale` and `get_series`. The cache is cleared by the
+		import methods of this class. Call `invalidate_cache` after modifying the entities directly.
+	store_observations: bool; default False
+		If `True`, each imported value is also written to the `Observation` table so that `get_cross_section` can
+		select a single timepoint without decoding every series.
+	"""
+
+	def __init__(self, filename: Union[str, Path], compact: bool = False, cache: Optional[EntityCache] = None,
+			store_observations: bool = False):
 		filename = str(filename)
+		self.filename = filename
+		self.compact = compact
+		self.cache = cache
+		self.store_observations = store_observations
+		_upgrade_schema(filename)
 		try:
 			self.database = sql_entities.main_database
 			self.database.bind("sqlite", str(filename), create_db = True)  # create_tables
@@ -27,65 +160,209 @@ class BasicRegionDatabase:
 		self.Series = sql_entities.Series
 		self.Scale = sql_entities.Scale
 		self.Tag = sql_entities.Tag
+		self.Observation = sql_entities.Observation
+
+	def _cached(self, kind: str, key: Any, loader: Callable[[], Any]) -> Any:
+		"""
+			Returns the cached result of a lookup, or calls `loader` if the result is not cached. Missing entities are
+			not cached, since they may be added through the entities at any time.
+		"""
+		if self.cache is None:
+			return loader()
+		found, value = self.cache.get(kind, key, lambda entity: _is_session_entity(self.database, entity))
+		if not found:
+			value = loader()
+			if value is not None:
+				self.cache.set(kind, key, value)
+		return value
+
+	def invalidate_cache(self, *kinds: str):
+		""" Clears the cached lookups of the given kinds ('region', 'report', 'scale', 'series'), or all of them."""
+		if self.cache is not None:
+			self.cache.invalidate(*kinds)
+
+	def cache_info(self) -> Dict[str, int]:
+		""" Returns the number of cache hits and misses. Both are 0 when caching is disabled."""
+		if self.cache is None:
+			return {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 0}
+		return self.cache.info()
 
 	def get_region(self, code = None, **kwargs) -> sql_entities.Region:
 		if code:
 			kwargs = {'code': code}
-		region: sql_entities.Region = self.Region.get(**kwargs)
+		region: sql_entities.Region = self._cached(
+			'region', tuple(sorted(kwargs.items())), lambda: self.Region.get(**kwargs)
+		)
 
 		return region
 
 	def get_report(self, name: str = None, **kwargs) -> sql_entities.Report:
 		if name:
 			kwargs = {'name': name}
-		report: sql_entities.Report = self.Report.get(**kwargs)
+		report: sql_entities.Report = self._cached(
+			'report', tuple(sorted(kwargs.items())), lambda: self.Report.get(**kwargs)
+		)
 		return report
 
 	def get_series(self, region: str, report: str, code: str) -> sql_entities.Series:
-		region_entity = self.get_region(region, asentity = True)
-		report_entity = self.get_report(report, asentity = True)
-		series = self.Series.get(region = region_entity, report = report_entity, code = code)
+		def _load() -> sql_entities.Series:
+			region_entity = self.get_region(region, asentity = True)
+			report_entity = self.get_report(report, asentity = True)
+			return self.Series.get(region = region_entity, report = report_entity, code = code)
+
+		series = self._cached('series', (region, report, code), _load)
 
 		return series
 
+	@db_session
+	def get_panel(self, report: str, codes: Union[str, Iterable[str], None] = None,
+			regions: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None) -> pandas.DataFrame:
+		"""
+			Retrieves every matching series from a report with a single query.
+		Parameters
+		----------
+		report: str
+			The name of the report.
+		codes: Union[str, Iterable[str], None]; default None
+			The series code(s) to retrieve. All series are retrieved if not given.
+		regions: Optional[Iterable[str]]; default None
+			The region codes to retrieve. All regions are retrieved if not given.
+		years: Optional[Iterable[int]]; default None
+			The timepoints to keep. All timepoints are kept if not given.
+
+		Returns
+		-------
+		pandas.DataFrame
+			- Columns -> the timepoints
+			- Index -> `regionCode` if a single series code was given, otherwise (`regionCode`, `seriesCode`)
+		"""
+		single_code = isinstance(codes, str)
+		if single_code:
+			codes = [codes]
+
+		query = 'SELECT "region", "code", "years", "values", "packed" FROM "Series" WHERE "report" = ?'
+		parameters = [report]
+		codes = _unique(codes) if codes is not None else None
+		regions = _unique(regions) if regions is not None else None
+		# Filters which would exceed sqlite's parameter limit are applied after the query instead.
+		if codes is not None and len(codes) < SQLITE_MAX_VARIABLES // 2:
+			query += f' AND "code" IN ({", ".join("?" * len(codes))})'
+			parameters += codes
+		if regions is not None and len(regions) < SQLITE_MAX_VARIABLES // 2:
+			query += f' AND "region" IN ({", ".join("?" * len(regions))})'
+			parameters += regions
+
+		rows = self.database.get_connection().execute(query, parameters).fetchall()
+		if codes is not None:
+			codes_set = set(codes)
+			rows = [row for row in rows if row[1] in codes_set]
+		if regions is not None:
+			regions_set = set(regions)
+			rows = [row for row in rows if row[0] in regions_set]
+
+		arrays = [_decode_series(*row[2:]) for row in rows]
+		lengths = numpy.array([len(row_years) for row_years, _ in arrays], dtype = int)
+		all_years = numpy.concatenate([i[0] for i in arrays] + [numpy.empty(0, dtype = int)]).astype(int)
+		all_values = numpy.concatenate([i[1] for i in arrays] + [numpy.empty(0)])
+
+		# Scatter every value into a (series x timepoints) matrix in one step.
+		columns = numpy.unique(all_years)
+		matrix = numpy.full((len(rows), len(columns)), numpy.nan)
+		matrix[numpy.repeat(numpy.arange(len(rows)), lengths), numpy.searchsorted(columns, all_years)] = all_values
+
+		if single_code:
+			index = pandas.Index([row[0] for row in rows], name = 'regionCode')
+		else:
+			index = pandas.MultiIndex.from_arrays(
+				[[row[0] for row in rows], [row[1] for row in rows]], names = ['regionCode', 'seriesCode']
+			)
+		panel = pandas.DataFrame(matrix, index = index, columns = columns)
+		if years is not None:
+			panel = panel.reindex(columns = sorted(set(years)))
+		return panel.sort_index()
+
 	def get_scale(self, code: str) -> sql_entities.Scale:
-		scale = self.Scale.get(code = code)
+		scale = self._cached('scale', code, lambda: self.Scale.get(code = code))
 		return scale
 
-	def check_regions(self, labels: List[str], by_code: bool = True) -> List[str]:
+	@db_session
+	def explain_queries(self, show: bool = True) -> Dict[str, List[str]]:
+		"""
+			Runs `EXPLAIN QUERY PLAN` on the queries used by the getters. Useful to check that each lookup uses an index
+			rather than scanning a table.
+		Parameters
+		----------
+		show: bool; default True
+			Whether to print the plans.
+
+		Returns
+		-------
+		Dict[str, List[str]]
+			The steps of the query plan for each query.
+		"""
+		value = ''
+		date = datetime.datetime.now()
+		queries = {
+			'get_region':        select(r for r in self.Region if r.code == value),
+			'get_region(name)':  select(r for r in self.Region if r.name == value),
+			'get_report':        select(r for r in self.Report if r.name == value),
+			'get_scale':         select(s for s in self.Scale if s.code == value),
+			'get_series':        select(
+				s for s in self.Series if s.region.code == value and s.report.name == value and s.code == value
+			),
+			'series by code':    select(s for s in self.Series if s.code == value),
+			'series by tag':     select(s for s in self.Series for t in s.tags if t.value == value),
+			'reports by date':   select(r for r in self.Report if r.date >= date),
+			'get_panel':         'SELECT "region", "code", "years", "values", "packed" FROM "Series" WHERE "report" = ? AND "code" IN (?)'
+		}
+
+		connection = self.database.get_connection()
+		plans = dict()
+		for name, query in queries.items():
+			sql = query if isinstance(query, str) else query.get_sql()
+			rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count('?')).fetchall()
+			plans[name] = [row[-1] for row in rows]
+			if show:
+				print(name)
+				for step in plans[name]:
+					print(f"\t{step}")
+		return plans
+
+	@db_session
+	def check_regions(self, labels: Iterable[str], by_code: bool = True) -> List[str]:
 		""" Checks to see if the all the region codes or names in the given list can be found in the database.
 			Parameters
 			----------
-				labels: List[str]
+				labels: Iterable[str]
 					A list of the region names or codes.
 				by_code: bool; default True
 					Tells the parser which identifier the given labels represent, coes or names.
+			Returns
+			-------
+				List[str]
+					The labels which could not be found, in the order they first appear in `labels`.
 		"""
-		missing_regions = list()
-		for region_label in labels:
+		labels = _unique(labels)
+		existing = set()
+		for chunk in _chunks(labels):
 			if by_code:
-				query = {'code': region_label}
+				existing.update(select(r.code for r in self.Region if r.code in chunk))
 			else:
-				query = {'name': region_label}
-			region_entity = self.Region.get(**query)
-			if region_entity is None:
-				missing_regions.append(region_label)
-		return missing_regions
+				existing.update(select(r.name for r in self.Region if r.name in chunk))
+		return [i for i in labels if i not in existing]
 
 	@db_session
-	def import_standard_data(self, report: sd.StandardReport, standard_table: List[sd.StandardSeries]):
-		"""
-			Import data formatted as a standard dataset into the database.
-			Import Order
-			------------
-			regions
-			reports
-			scale
-			units
-			series
-			notes
-			tags
-		"""
+	def check_scales(self, codes: Iterable[str]) -> List[str]:
+		""" Returns the scale codes which are not in the database."""
+		codes = _unique(codes)
+		existing = set()
+		for chunk in _chunks(codes):
+			existing.update(select(s.code for s in self.Scale if s.code in chunk))
+		return [i for i in codes if i not in existing]
+
+	@db_session
+	def check_standard_data(self, standard_table: List[sd.StandardSeries]):
+		""" Makes sure the regions and scales used by a dataset are already in the database."""
 		# Check for missing regions before attempting to upload data.
 		region_codes = [i.region_code for i in standard_table]
 		missing_regions = self.check_regions(region_codes)
@@ -96,40 +373,251 @@ class BasicRegionDatabase:
 		# Make sure the required scale objects are present in the database
 		all_scales = [i.scale for i in standard_table]
 		# Scales should have already been cleaned so that they are labeled by their standard prefixes.
-		missing_scales = [i for i in all_scales if self.get_scale(i) is None]
+		missing_scales = self.check_scales(all_scales)
 		if missing_scales:
 			message = f"The following scales should be added to the database: {missing_scales}"
 			raise ValueError(message)
 
-	# Add the report to the database
+	@contextmanager
+	def bulk_connection(self) -> Iterator[sqlite3.Connection]:
+		"""
+			Provides a connection for bulk inserts. Everything written through the connection is committed in a single
+			transaction. The database is switched to WAL mode and the connection uses `synchronous = NORMAL`, which
+			is safe in WAL mode and avoids an fsync for every write.
+
+			If this is used inside a `db_session`, the session is committed first. Otherwise any pending pony writes
+			would hold sqlite's write lock and the connection would fail with "database is locked".
+		"""
+		if self.filename == ':memory:':
+			# In-memory databases are only visible through pony's own connection.
+			with db_session:
+				yield self.database.get_connection()
+			return
 
-	# Add the series to the database
+		if local.db_session is not None:
+			commit()
+
+		# Pony always keeps its connection inside a transaction, which prevents changing the pragmas.
+		connection = sqlite3.connect(self.filename, isolation_level = None, timeout = 30)
+		try:
+			connection.execute("PRAGMA journal_mode = WAL")
+			connection.execute("PRAGMA synchronous = NORMAL")
+			connection.execute("PRAGMA foreign_keys = true")
+			connection.execute("BEGIN IMMEDIATE TRANSACTION")
+			try:
+				yield connection
+			except BaseException:
+				connection.execute("ROLLBACK")
+				raise
+			connection.execute("COMMIT")
+		finally:
+			connection.close()
+
+	def import_standard_data(self, report: sd.StandardReport, standard_table: Iterable[sd.StandardSeries]) -> int:
+		"""
+			Import data formatted as a standard dataset into the database.
+			The report, tags and series are inserted with batched sql in a single transaction.
+			Import Order
+			------------
+			reports
+			tags
+			series
+			series tags
+		Parameters
+		----------
+		report: StandardReport
+		standard_table: Iterable[StandardSeries]
+			The regions and scales referenced by each series must already be in the database.
+
+		Returns
+		-------
+		int
+			The number of series imported.
+		"""
+		standard_table = list(standard_table)
+		self.check_standard_data(standard_table)
+
+		start = time.time()
+		series_rows = list()
+		tag_rows = list()
+		observation_rows = list()
+		for series in standard_table:
+			years = [int(year) for year, _ in series.values]
+			values = [float(value) for _, value in series.values]
+			if self.store_observations:
+				observation_rows += _get_observations(report.name, series.region_code, series.series_code, years, values)
+			if self.compact:
+				arrays = ('[]', '[]', series_encoding.pack_series(years, values))
+			else:
+				arrays = (_encode_array(years), _encode_array(values), None)
+			series_rows.append((
+				series.series_code, _to_text(series.description), _to_text(series.series_name), _to_text(series.notes),
+				series.region_code, report.name, series.scale, _to_text(series.units), *arrays
+			))
+			for tag in _to_tags(series.tags):
+				tag_rows.append((report.name, series.region_code, series.series_code, tag))
+
+		with self.bulk_connection() as connection:
+			connection.execute(SQL_INSERT_REPORT, (report.name, _to_timestamp(report.date), report.url, report.agency))
+			connection.executemany(SQL_INSERT_TAG, {(i[-1],) for i in tag_rows})
+			connection.executemany(SQL_INSERT_SERIES, series_rows)
+			connection.executemany(SQL_INSERT_SERIES_TAG, tag_rows)
+			connection.executemany(SQL_INSERT_OBSERVATION, observation_rows)
+		self.invalidate_cache('report', 'series')
+
+		duration = time.time() - start
+		rate = len(series_rows) / duration if duration else math.inf
+		logger.info(f"Imported {len(series_rows)} series from '{report.name}' in {duration:.2f}s ({rate:.0f} rows/s)")
+		return len(series_rows)
+
+	def migrate_series_storage(self, vacuum: bool = True) -> int:
+		"""
+			Converts every series stored as json arrays to the packed binary format. New series are only stored in the
+			packed format if the database was opened with `compact = True`.
+		Parameters
+		----------
+		vacuum: bool; default True
+			Whether to rebuild the database file afterwards so that the freed space is returned to the filesystem.
+
+		Returns
+		-------
+		int
+			The number of series converted.
+		"""
+		with self.bulk_connection() as connection:
+			rows = connection.execute(
+				'SELECT "report", "region", "code", "years", "values" FROM "Series" WHERE "packed" IS NULL'
+			).fetchall()
+			updates = [
+				('[]', '[]', series_encoding.pack_series(json.loads(years), json.loads(values)), report, region, code)
+				for report, region, code, years, values in rows
+			]
+			connection.executemany(
+				'UPDATE "Series" SET "years" = ?, "values" = ?, "packed" = ? WHERE "report" = ? AND "region" = ? AND "code" = ?',
+				updates
+			)
+		self.invalidate_cache('series')
+
+		if vacuum and self.filename != ':memory:':
+			connection = sqlite3.connect(self.filename, isolation_level = None)
+			try:
+				connection.execute("VACUUM")
+			finally:
+				connection.close()
+		logger.info(f"Converted {len(updates)} series to the packed format")
+		return len(updates)
+
+	def build_observations(self, report: Optional[str] = None) -> int:
+		"""
+			Fills the `Observation` table for series imported before `store_observations` was enabled.
+		Parameters
+		----------
+		report: Optional[str]
+			Only add the observations of this report. All reports are used if not given.
+
+		Returns
+		-------
+		int
+			The number of observations added.
+		"""
+		query = """SELECT "report", "region", "code", "years", "values", "packed" FROM "Series" "s"
+			WHERE NOT EXISTS (
+				SELECT 1 FROM "Observation" "o"
+				WHERE "o"."series_report" = "s"."report" AND "o"."series_region" = "s"."region" AND "o"."series_code" = "s"."code"
+			)"""
+		parameters = list()
+		if report is not None:
+			query += ' AND "report" = ?'
+			parameters.append(report)
+
+		with self.bulk_connection() as connection:
+			rows = list()
+			for report_name, region, code, years, values, packed in connection.execute(query, parameters).fetchall():
+				years, values = _decode_series(years, values, packed)
+				rows += _get_observations(report_name, region, code, years.tolist(), values.tolist())
+			connection.executemany(SQL_INSERT_OBSERVATION, rows)
+		return len(rows)
+
+	@db_session
+	def get_cross_section(self, report: str, timepoint: int,
+			codes: Union[str, Iterable[str], None] = None) -> Union[pandas.DataFrame, pandas.Series]:
+		"""
+			Retrieves the values of every series in a report at a single timepoint. Only uses the `Observation` table,
+			so the report must have been imported with `store_observations` enabled (or added with `build_observations`).
+		Parameters
+		----------
+		report: str
+		timepoint: int
+		codes: Union[str, Iterable[str], None]; default None
+			The series code(s) to retrieve. All series are retrieved if not given.
+
+		Returns
+		-------
+		Union[pandas.DataFrame, pandas.Series]
+			A table of regions x series codes, or a series indexed by region if a single code was given.
+		"""
+		single_code = isinstance(codes, str)
+		if single_code:
+			codes = [codes]
+
+		query = """SELECT "series_region", "series_code", "value" FROM "Observation"
+			WHERE "timepoint" = ? AND "series_report" = ?"""
+		parameters = [timepoint, report]
+		codes = _unique(codes) if codes is not None else None
+		# Longer code lists are filtered after the query, as in `get_panel`.
+		if codes is not None and len(codes) < SQLITE_MAX_VARIABLES // 2:
+			query += f' AND "series_code" IN ({", ".join("?" * len(codes))})'
+			parameters += codes
+		rows = self.database.get_connection().execute(query, parameters).fetchall()
+		if codes is not None:
+			codes_set = set(codes)
+			rows = [row for row in rows if row[1] in codes_set]
+
+		table = pandas.DataFrame(rows, columns = ['regionCode', 'seriesCode', timepoint])
+		if single_code:
+			return table.set_index('regionCode')[timepoint].sort_index()
+		table = table.pivot(index = 'regionCode', columns = 'seriesCode', values = timepoint)
+		return table.sort_index().sort_index(axis = 1)
 
 	@db_session
-	def import_regions(self, regiondata: Union[Path, Iterable[sd.StandardRegion]]):
-		""" Adds a series of regions to the database.
+	def import_regions(self, regiondata: Union[Path, Iterable[sd.StandardRegion]]) -> int:
+		""" Adds a series of regions to the database. Regions which are already in the database are skipped.
 			Parameters
 			----------
 				regiondata: Union[Path, Iterable[StandardRegion]
 					Path to a three-column file with the code, name and type of each region to import. column names should be 'name', 'code', 'type'.
+			Returns
+			-------
+				int
+					The number of regions added.
 		"""
 		if isinstance(regiondata, Path):
 			raise NotImplementedError
 		else:
 			regions = regiondata
 
-		has_valid_codes = [i for i in regions if isinstance(i.code, str)]
-		missing_regions = [i for i in has_valid_codes if self.Region.get(code = i.code) is None]
+		# Keep the first region given for each code.
+		regions_by_code = dict()
+		for region in regions:
+			if isinstance(region.code, str):
+				regions_by_code.setdefault(region.code, region)
 
-		for item in missing_regions:
-			self.Region(name = item.name, code = item.code, type = item.type)
+		missing_codes = self.check_regions(regions_by_code.keys())
+		rows = [(code, regions_by_code[code].name, regions_by_code[code].type) for code in missing_codes]
+
+		# Make sure regions created through pony in this session are written before the batch.
+		flush()
+		self.database.get_connection().executemany(SQL_INSERT_REGION, rows)
+		self.invalidate_cache('region', 'series')
+		return len(rows)
 
 
 class RegionDatabase(BasicRegionDatabase):
 	""" Simple class for preloading the data with commonly-used data."""
 
-	def __init__(self, filename: Path):
-		super().__init__(filename)
+	def __init__(self, filename: Path, compact: bool = False, cache: Optional[EntityCache] = None,
+			store_observations: bool = False):
+		super().__init__(filename, compact, cache, store_observations)
 		self.add_scales()
 
 	# TODO Add more data later, like the weo dataset
@@ -140,14 +628,15 @@ class RegionDatabase(BasicRegionDatabase):
 			code = scale.prefix if scale.prefix else 'unit'
 			if self.Scale.get(code = code) is None:
 				self.Scale(code = code, multiplier = scale.multiplier)
+		self.invalidate_cache('scale')
 
 	def add_namespace_iso(self):
 		""" Adds the ISO3 namespace to the database."""
 		iso_table = datasets.get_namespace_iso()
-		regiondata = list()
-		for index, row in iso_table.iterrows():
-			region = sd.StandardRegion(code = row['iso3'], name = row['regionName'], type = 'country')
-			regiondata.append(region)
+		regiondata = [
+			sd.StandardRegion(code = code, name = name, type = 'country')
+			for code, name in zip(iso_table['iso3'], iso_table['regionName'])
+		]
 
 		self.import_regions(regiondata)
 
@@ -156,8 +645,8 @@ class RegionDatabase(BasicRegionDatabase):
 		usps_table = datasets.get_namespace_usps()
 
 		regiondata = [
-			sd.StandardRegion(code = row['usps'], name = row['regionName'], type = row['regionType'])
-			for _, row in usps_table.iterrows()
+			sd.StandardRegion(code = code, name = name, type = region_type)
+			for code, name, region_type in zip(usps_table['usps'], usps_table['regionName'], usps_table['regionType'])
 		]
 
 		self.import_regions(regiondata)
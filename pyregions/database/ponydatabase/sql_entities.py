@@ -1,8 +1,8 @@
 import datetime
-from pyregions.database import data_entities
-from typing import List
+from pyregions.database import data_entities, series_encoding
+from typing import Any, Dict, List
 import pandas
-from pony.orm import Database, FloatArray, IntArray, Optional, PrimaryKey, Required, Set
+from pony.orm import Database, FloatArray, IntArray, Optional, PrimaryKey, Required, Set, composite_index
 
 main_database = Database()
 
@@ -10,7 +10,7 @@ main_database = Database()
 class Region(main_database.Entity):
 	entity_type = 'region'
 	code: str = PrimaryKey(str)
-	name: str = Required(str)  # PrimaryKey(str)
+	name: str = Required(str, index = True)  # PrimaryKey(str)
 	type: str = Required(str)
 	series: List['Series'] = Set('Series')
 
@@ -20,16 +20,26 @@ class Region(main_database.Entity):
 			name = self.name,
 			type = self.type
 		)
+		return r
 
 class Report(main_database.Entity):
 	entity_type = 'report'
-	date: datetime.datetime = Required(datetime.datetime)
+	date: datetime.datetime = Required(datetime.datetime, index = True)
 	name: str = PrimaryKey(str)
 	url: str = Required(str)
 	agency: str = Required(str)
 	series: List['Series'] = Set('Series')
 	day_of_year:int = Optional(int) # Used to indicate the day of year that the dataset corresponds to. Ex. census data starts mid-year.
 
+	def todict(self) -> Dict[str, Any]:
+		return {
+			'name':      self.name,
+			'date':      self.date,
+			'url':       self.url,
+			'agency':    self.agency,
+			'dayOfYear': self.day_of_year
+		}
+
 
 
 class Series(main_database.Entity):
@@ -44,9 +54,20 @@ class Series(main_database.Entity):
 	scale: 'Scale' = Required('Scale')
 	units: str = Required(str)
 	tags: List['Tag'] = Set('Tag')
+	observations: List['Observation'] = Set('Observation')
 	PrimaryKey(report, region, code)
+	# Used to find a series code across reports. Also covers lookups by code alone.
+	composite_index(code, region)
 	years: List[int] = Required(IntArray)
 	values: List[float] = Required(FloatArray)
+	# When set, `years` and `values` are left empty and the series is stored as a `series_encoding` blob instead.
+	packed: bytes = Optional(bytes)
+
+	def get_data(self) -> pandas.Series:
+		if self.packed:
+			years, values = series_encoding.unpack_series(self.packed)
+			return pandas.Series(values, index = years)
+		return pandas.Series(self.values, index = self.years)
 
 	def load(self)->data_entities.DataSeries:
 		s = data_entities.DataSeries(
@@ -58,10 +79,10 @@ class Series(main_database.Entity):
 
 			region = self.region.load(),
 			report = self.report.todict(),
-			scale = self.scale,
+			scale = self.scale.code,
 			units = self.units,
 			tags = [i.value for i in self.tags],
-			data = pandas.Series(self.values, index = self.years)
+			data = self.get_data()
 		)
 		return s
 
@@ -74,6 +95,16 @@ class Scale(main_database.Entity):
 	series: str = Set(Series)
 
 
+class Observation(main_database.Entity):
+	""" One value of a series. Only stored when the database is opened with `store_observations = True`."""
+	series: Series = Required(Series)
+	timepoint: int = Required(int)
+	value: float = Required(float)
+	PrimaryKey(series, timepoint)
+	# Used to select a single timepoint across every series.
+	composite_index(timepoint, series)
+
+
 class Tag(main_database.Entity):
 	entity_type = 'tag'
 	value: str = PrimaryKey(str)
@@ -0,0 +1,146 @@
+"""
+	Packs the timepoints and values of a series into a little-endian binary blob.
+
+	Layout
+	------
+	header: 16 bytes, `<BBxxiiI`
+		version, flags, (padding), start year, step, number of values
+	years: int32 x count
+		Only present when `FLAG_EXPLICIT_YEARS` is set. Regular series (ex. annual data) only store the start and step.
+	values: float64 x count
+"""
+import json
+import struct
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy
+
+VERSION = 1
+FLAG_EXPLICIT_YEARS = 1
+
+HEADER = struct.Struct('<BBxxiiI')
+YEAR_DTYPE = numpy.dtype('<i4')
+VALUE_DTYPE = numpy.dtype('<f8')
+
+
+def _to_array(values: Iterable, dtype: numpy.dtype) -> numpy.ndarray:
+	if not isinstance(values, (numpy.ndarray, list, tuple)):
+		values = list(values)
+	return numpy.asarray(values, dtype = dtype)
+
+
+def _get_step(years: numpy.ndarray) -> Optional[int]:
+	""" Returns the spacing between the years if it is constant, otherwise `None`."""
+	if len(years) < 2:
+		return 1
+	steps = numpy.diff(years)
+	step = int(steps[0])
+	if step > 0 and (steps == step).all():
+		return step
+	return None
+
+
+def pack_series(years: Iterable[int], values: Iterable[float]) -> bytes:
+	"""
+		Encodes a series as a binary blob.
+	Parameters
+	----------
+	years: Iterable[int]
+	values: Iterable[float]
+		Must be the same length as `years`. Missing values should be NaN.
+
+	Returns
+	-------
+	bytes
+	"""
+	years = _to_array(years, YEAR_DTYPE)
+	values = _to_array(values, VALUE_DTYPE)
+	if years.shape != values.shape:
+		message = f"The years and values must be the same length: {len(years)} != {len(values)}"
+		raise ValueError(message)
+
+	step = _get_step(years)
+	start = int(years[0]) if len(years) else 0
+	if step is None:
+		header = HEADER.pack(VERSION, FLAG_EXPLICIT_YEARS, start, 0, len(values))
+		return header + years.tobytes() + values.tobytes()
+
+	header = HEADER.pack(VERSION, 0, start, step, len(values))
+	return header + values.tobytes()
+
+
+def unpack_series(blob: bytes) -> Tuple[numpy.ndarray, numpy.ndarray]:
+	"""
+		Decodes a blob created by `pack_series`. The values are a read-only view of `blob` rather than a copy.
+	Parameters
+	----------
+	blob: bytes
+
+	Returns
+	-------
+	Tuple[numpy.ndarray, numpy.ndarray]
+		The years and values of the series.
+	"""
+	version, flags, start, step, count = HEADER.unpack_from(blob)
+	if version != VERSION:
+		message = f"Unsupported series encoding version: {version}"
+		raise ValueError(message)
+
+	offset = HEADER.size
+	if flags & FLAG_EXPLICIT_YEARS:
+		years = numpy.frombuffer(blob, dtype = YEAR_DTYPE, count = count, offset = offset)
+		offset += years.nbytes
+	else:
+		years = numpy.arange(start, start + step * count, step, dtype = YEAR_DTYPE)[:count]
+	values = numpy.frombuffer(blob, dtype = VALUE_DTYPE, count = count, offset = offset)
+	return years, values
+
+
+def benchmark(series: int = 10000, length: int = 45, repeat: int = 3) -> Dict[str, Any]:
+	"""
+		Compares the packed encoding against the json arrays pony uses for `IntArray`/`FloatArray` attributes.
+	Parameters
+	----------
+	series: int; default 10000
+		The number of series to encode.
+	length: int; default 45
+		The number of annual values in each series.
+	repeat: int; default 3
+		The best time of this many runs is reported.
+
+	Returns
+	-------
+	Dict[str, Any]
+		The total encoded size (bytes) and decode time (seconds) of each format.
+	"""
+	random = numpy.random.default_rng(0)
+	years = numpy.arange(1980, 1980 + length)
+	data = [random.random(length) * 1000 for _ in range(series)]
+
+	json_rows = [(json.dumps(years.tolist()), json.dumps(values.tolist())) for values in data]
+	packed_rows = [pack_series(years, values) for values in data]
+
+	def _best(function) -> float:
+		timings = list()
+		for _ in range(repeat):
+			start = time.perf_counter()
+			function()
+			timings.append(time.perf_counter() - start)
+		return min(timings)
+
+	json_time = _best(lambda: [(numpy.array(json.loads(y)), numpy.array(json.loads(v))) for y, v in json_rows])
+	packed_time = _best(lambda: [unpack_series(blob) for blob in packed_rows])
+
+	return {
+		'json_size':   sum(len(y) + len(v) for y, v in json_rows),
+		'packed_size': sum(len(blob) for blob in packed_rows),
+		'json_time':   json_time,
+		'packed_time': packed_time
+	}
+
+
+if __name__ == "__main__":
+	result = benchmark()
+	print(f"json:   {result['json_size'] / 1e6:.1f} MB, decoded in {result['json_time']:.3f}s")
+	print(f"packed: {result['packed_size'] / 1e6:.1f} MB, decoded in {result['packed_time']:.3f}s")
@@ -1,42 +1,449 @@
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Column, Integer, String, DateTime, Float
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from typing import Optional
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import datetime
+import itertools
+import math
+
+import pandas
+from infotools import numbertools
+from loguru import logger
+
+from pyregions import standard_definition as sd
+from pyregions.database import data_entities, series_encoding
 
 try:
 	import sqlentities
 except:
 	from . import sqlentities
 
+# The namespace used for the region codes referenced by each series.
+STANDARD_NAMESPACE = 'standard'
+# The default maximum number of parameters in a single sqlite statement.
+SQLITE_MAX_VARIABLES = 999
+
+NAMESPACES = sqlentities.Namespace.__table__
+REGIONS = sqlentities.Region.__table__
+REGION_CODES = sqlentities.RegionCode.__table__
+REGION_CODE_LINKS = sqlentities._intermediate_table_region_regioncode
+REPORTS = sqlentities.Report.__table__
+SCALES = sqlentities.Scale.__table__
+SERIES = sqlentities.Series.__table__
+TAGS = sqlentities.Tag.__table__
+SERIES_TAGS = sqlentities._intermediate_table_series_tag
+OBSERVATIONS = sqlentities.Observation.__table__
+
+
+def _chunks(values: List[Any], size: int = SQLITE_MAX_VARIABLES) -> Iterator[List[Any]]:
+	for index in range(0, len(values), size):
+		yield values[index:index + size]
+
+
+def _filter_chunks(*filters: Optional[Iterable[Any]]) -> Iterator[Tuple[Optional[List[Any]], ...]]:
+	"""
+		Splits several `IN` filters into chunks which together stay below sqlite's parameter limit. Yields every
+		combination of chunks. Filters which are `None` are yielded as `None`.
+	"""
+	filters = [_unique(values) if values is not None else None for values in filters]
+	# Leave some room for the other parameters of the query.
+	size = max(1, (SQLITE_MAX_VARIABLES - 10) // max(1, len([i for i in filters if i is not None])))
+	chunks = [list(_chunks(values, size)) if values is not None else [None] for values in filters]
+	return itertools.product(*chunks)
+
+
+def _unique(values: Iterable[Any]) -> List[Any]:
+	return list(dict.fromkeys(values))
+
+
+def _to_text(value: Any) -> Optional[str]:
+	""" Missing values (NaN) are stored as NULL."""
+	if value is None or (isinstance(value, float) and math.isnan(value)):
+		return None
+	return str(value)
+
+
+def _to_tags(value: Any) -> List[str]:
+	""" Tags can be given as a list or as a '|'-delimited string."""
+	if isinstance(value, str):
+		value = value.split('|')
+	elif not isinstance(value, (list, tuple, set)):
+		return []
+	return _unique(str(i).strip() for i in value if _to_text(i) and str(i).strip())
+
 
 class BaseDatabase:
-	def __init__(self, filename = None):
+	"""
+		Region database built on SQLAlchemy Core. Writes use batched `insert()` statements and the getters return the
+		plain containers from `data_entities`, so there is no ORM session or identity map.
+	Parameters
+	----------
+	filename: Optional[str]
+		An sqlite file, or a full database url (ex. 'postgresql://localhost/regions'). Defaults to an in-memory
+		sqlite database.
+	store_observations: bool; default False
+		If `True`, each imported value is also written to the `observations` table so that `get_cross_section` can
+		select a single timepoint without decoding every series.
+	"""
+
+	def __init__(self, filename = None, store_observations: bool = False):
 		if filename is None:
 			self.filename = ':memory:'
 		else:
-			self.filename = filename
+			self.filename = str(filename)
+		self.store_observations = store_observations
 
-		self.session = self.create_database(self.filename)
+		self.engine = self.create_database(self.filename)
 
-	def create_database(self, filename: Optional[str]):
+	def create_database(self, filename: Optional[str]) -> Engine:
 		""" Creates an sqlite database."""
-		engine = create_engine(f'sqlite:///{filename}')
+		url = filename if '://' in filename else f'sqlite:///{filename}'
+		engine = create_engine(url)
 
 		sqlentities.EntityBase.metadata.create_all(engine)
-		Session = sessionmaker(bind = engine)  # This is a class, not an object
-		session = Session()
+		# `create_all` skips tables which already exist, so indexes added since the database was created are made here.
+		for table in sqlentities.EntityBase.metadata.sorted_tables:
+			for index in table.indexes:
+				index.create(engine, checkfirst = True)
+
+		return engine
+
+	@staticmethod
+	def _upsert_report(connection: Connection, values: Dict[str, Any]):
+		""" Inserts a report, or updates the date, url and agency of an existing report with the same name."""
+		dialects = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+		dialect_insert = dialects.get(connection.dialect.name)
+		if dialect_insert is not None:
+			statement = dialect_insert(REPORTS).values(**values)
+			updates = {column: statement.excluded[column] for column in values if column != 'name'}
+			connection.execute(statement.on_conflict_do_update(index_elements = [REPORTS.c.name], set_ = updates))
+		elif connection.execute(select(REPORTS.c.name).where(REPORTS.c.name == values['name'])).first() is None:
+			connection.execute(insert(REPORTS).values(**values))
+		else:
+			connection.execute(update(REPORTS).where(REPORTS.c.name == values['name']).values(**values))
+
+	@staticmethod
+	def _select_existing(connection: Connection, column, values: Iterable[Any]) -> Set[Any]:
+		""" Returns the values which are already in `column`."""
+		existing = set()
+		for chunk in _chunks(_unique(values)):
+			existing.update(connection.execute(select(column).where(column.in_(chunk))).scalars())
+		return existing
+
+	@staticmethod
+	def _insert_values(connection: Connection, table, rows: List[Dict[str, Any]], batch_size: int = 10000):
+		"""
+			Inserts rows in batches. Passing the rows as parameters (rather than `insert().values(rows)`) lets the
+			statement be compiled once and executed with the driver's executemany.
+		"""
+		for chunk in _chunks(rows, batch_size):
+			connection.execute(insert(table), chunk)
+
+	def _get_namespace_id(self, connection: Connection, name: str, create: bool = False) -> Optional[int]:
+		namespace_id = connection.execute(select(NAMESPACES.c.id).where(NAMESPACES.c.name == name)).scalar()
+		if namespace_id is None and create:
+			namespace_id = connection.execute(insert(NAMESPACES).values(name = name)).inserted_primary_key[0]
+		return namespace_id
+
+	def _find_region_ids(self, connection: Connection, codes: Iterable[str],
+			namespace: str = STANDARD_NAMESPACE) -> Dict[str, int]:
+		""" Maps each of the given codes from `namespace` to the id of the matching region."""
+		query = select(REGION_CODES.c.value, REGION_CODE_LINKS.c.region_id) \
+			.join(REGION_CODE_LINKS, REGION_CODE_LINKS.c.region_code == REGION_CODES.c.id) \
+			.join(NAMESPACES, NAMESPACES.c.id == REGION_CODES.c._namespace_id) \
+			.where(NAMESPACES.c.name == namespace)
+
+		region_ids = dict()
+		for chunk in _chunks(_unique(codes)):
+			for code, region_id in connection.execute(query.where(REGION_CODES.c.value.in_(chunk))):
+				region_ids.setdefault(code, region_id)
+		return region_ids
+
+	def add_scales(self) -> int:
+		""" Adds every scale which is not already in the database."""
+		rows = [
+			{'code': scale.prefix if scale.prefix else 'unit', 'multiplier': scale.multiplier}
+			for scale in numbertools.SCALE
+		]
+		with self.engine.begin() as connection:
+			existing = self._select_existing(connection, SCALES.c.code, [i['code'] for i in rows])
+			rows = list({i['code']: i for i in rows if i['code'] not in existing}.values())
+			self._insert_values(connection, SCALES, rows)
+		return len(rows)
+
+	def import_regions(self, regions: Iterable[sd.StandardRegion], namespace: str = STANDARD_NAMESPACE) -> int:
+		"""
+			Adds regions to the database. Regions with a code already in the namespace are skipped.
+		Parameters
+		----------
+		regions: Iterable[StandardRegion]
+		namespace: str; default 'standard'
+			The namespace of the region codes. Series refer to regions by their code in the 'standard' namespace.
+
+		Returns
+		-------
+		int
+			The number of regions added.
+		"""
+		regions_by_code = dict()
+		for region in regions:
+			if isinstance(region.code, str):
+				regions_by_code.setdefault(region.code, region)
+
+		with self.engine.begin() as connection:
+			namespace_id = self._get_namespace_id(connection, namespace, create = True)
+			existing = self._find_region_ids(connection, regions_by_code, namespace)
+			missing = [region for code, region in regions_by_code.items() if code not in existing]
+			if not missing:
+				return 0
+
+			# The new ids are needed to link the regions to their codes.
+			region_ids = connection.execute(
+				insert(REGIONS).returning(REGIONS.c.id, sort_by_parameter_order = True),
+				[{'name': region.name, 'type': region.type} for region in missing]
+			).scalars().all()
+			code_ids = connection.execute(
+				insert(REGION_CODES).returning(REGION_CODES.c.id, sort_by_parameter_order = True),
+				[{'value': region.code, '_namespace_id': namespace_id} for region in missing]
+			).scalars().all()
+			self._insert_values(
+				connection, REGION_CODE_LINKS,
+				[{'region_id': region_id, 'region_code': code_id} for region_id, code_id in zip(region_ids, code_ids)]
+			)
+		return len(missing)
+
+	def import_standard_data(self, report: sd.StandardReport, standard_table: Iterable[sd.StandardSeries]) -> int:
+		"""
+			Imports a standard dataset in a single transaction.
+		Parameters
+		----------
+		report: StandardReport
+		standard_table: Iterable[StandardSeries]
+			The regions and scales referenced by each series must already be in the database.
+
+		Returns
+		-------
+		int
+			The number of series imported.
+		"""
+		standard_table = list(standard_table)
+		with self.engine.begin() as connection:
+			region_ids = self._find_region_ids(connection, [i.region_code for i in standard_table])
+			missing_regions = [i for i in _unique(i.region_code for i in standard_table) if i not in region_ids]
+			if missing_regions:
+				message = f"The following regions could not be found in the database: {missing_regions}"
+				raise ValueError(message)
+
+			scales = _unique(i.scale for i in standard_table)
+			missing_scales = [i for i in scales if i not in self._select_existing(connection, SCALES.c.code, scales)]
+			if missing_scales:
+				message = f"The following scales should be added to the database: {missing_scales}"
+				raise ValueError(message)
+
+			date = report.date if isinstance(report.date, datetime.date) else datetime.datetime.fromisoformat(str(report.date))
+			self._upsert_report(connection, {'name': report.name, 'date': date, 'url': report.url, 'agency': report.agency})
+
+			series_rows = list()
+			series_tags = dict()
+			series_values = dict()
+			for series in standard_table:
+				region_id = region_ids[series.region_code]
+				series_rows.append({
+					'code':          series.series_code,
+					'description':   _to_text(series.description),
+					'name':          _to_text(series.series_name),
+					'notes':         _to_text(series.notes),
+					'units':         _to_text(series.units),
+					'_region_id':    region_id,
+					'_report_name':  report.name,
+					'_scale_code':   series.scale,
+					'packed':        series_encoding.pack_series(
+						[year for year, _ in series.values], [value for _, value in series.values]
+					)
+				})
+				series_tags[(region_id, series.series_code)] = _to_tags(series.tags)
+				series_values[(region_id, series.series_code)] = series.values
+
+			tags = _unique(tag for values in series_tags.values() for tag in values)
+			existing_tags = self._select_existing(connection, TAGS.c.value, tags)
+			self._insert_values(connection, TAGS, [{'value': tag} for tag in tags if tag not in existing_tags])
+			self._insert_values(connection, SERIES, series_rows)
+
+			# Look up the ids of the new series to link them to their tags.
+			query = select(SERIES.c._region_id, SERIES.c.code, SERIES.c.id).where(SERIES.c._report_name == report.name)
+			series_ids = {(region_id, code): series_id for region_id, code, series_id in connection.execute(query)}
+			tag_rows = [
+				{'series_id': series_ids[key], 'tag': tag}
+				for key, values in series_tags.items() for tag in values
+			]
+			self._insert_values(connection, SERIES_TAGS, tag_rows)
+
+			if self.store_observations:
+				# Missing values are not stored.
+				observation_rows = [
+					{'series_id': series_ids[key], 'timepoint': int(year), 'value': float(value)}
+					for key, values in series_values.items() for year, value in values if value == value
+				]
+				self._insert_values(connection, OBSERVATIONS, observation_rows)
+
+		logger.info(f"Imported {len(series_rows)} series from '{report.name}'")
+		return len(series_rows)
+
+	def get_cross_section(self, report: str, timepoint: int,
+			codes: Union[str, Iterable[str], None] = None) -> Union[pandas.DataFrame, pandas.Series]:
+		"""
+			Retrieves the values of every series in a report at a single timepoint. Only uses the `observations` table,
+			so the report must have been imported with `store_observations` enabled.
+		Parameters
+		----------
+		report: str
+		timepoint: int
+		codes: Union[str, Iterable[str], None]; default None
+			The series code(s) to retrieve. All series are retrieved if not given.
+
+		Returns
+		-------
+		Union[pandas.DataFrame, pandas.Series]
+			A table of regions x series codes, or a series indexed by region if a single code was given.
+		"""
+		single_code = isinstance(codes, str)
+		if single_code:
+			codes = [codes]
+
+		query = select(REGION_CODES.c.value, SERIES.c.code, OBSERVATIONS.c.value) \
+			.select_from(OBSERVATIONS) \
+			.join(SERIES, SERIES.c.id == OBSERVATIONS.c.series_id) \
+			.join(REGION_CODE_LINKS, REGION_CODE_LINKS.c.region_id == SERIES.c._region_id) \
+			.join(REGION_CODES, REGION_CODES.c.id == REGION_CODE_LINKS.c.region_code) \
+			.join(NAMESPACES, NAMESPACES.c.id == REGION_CODES.c._namespace_id) \
+			.where(
+				OBSERVATIONS.c.timepoint == timepoint, SERIES.c._report_name == report,
+				NAMESPACES.c.name == STANDARD_NAMESPACE
+			)
+		rows = list()
+		with self.engine.connect() as connection:
+			for (chunk,) in _filter_chunks(codes):
+				chunk_query = query.where(SERIES.c.code.in_(chunk)) if chunk is not None else query
+				rows += [tuple(row) for row in connection.execute(chunk_query)]
+
+		table = pandas.DataFrame(rows, columns = ['regionCode', 'seriesCode', timepoint])
+		if single_code:
+			return table.set_index('regionCode')[timepoint].sort_index()
+		table = table.pivot(index = 'regionCode', columns = 'seriesCode', values = timepoint)
+		return table.sort_index().sort_index(axis = 1)
+
+	def get_region(self, code: str, namespace: str = STANDARD_NAMESPACE) -> Optional[data_entities.DataRegion]:
+		with self.engine.connect() as connection:
+			region_id = self._find_region_ids(connection, [code], namespace).get(code)
+			if region_id is None:
+				return None
+			row = connection.execute(select(REGIONS.c.name, REGIONS.c.type).where(REGIONS.c.id == region_id)).first()
+		return data_entities.DataRegion(code = code, name = row.name, type = row.type)
+
+	def get_report(self, name: str) -> Optional[Dict[str, Any]]:
+		with self.engine.connect() as connection:
+			row = connection.execute(select(REPORTS).where(REPORTS.c.name == name)).first()
+		if row is None:
+			return None
+		return {
+			'name':      row.name,
+			'date':      row.date,
+			'url':       row.url,
+			'agency':    row.agency,
+			'dayOfYear': row.day_of_year
+		}
+
+	def get_scale(self, code: str) -> Optional[data_entities.DataScale]:
+		with self.engine.connect() as connection:
+			row = connection.execute(select(SCALES).where(SCALES.c.code == code)).first()
+		if row is None:
+			return None
+		return data_entities.DataScale(code = row.code, multiplier = row.multiplier)
+
+	def get_series(self, region: str, report: str, code: str) -> Optional[data_entities.DataSeries]:
+		return next(self.iter_series(report, codes = [code], regions = [region]), None)
+
+	def iter_series(self, report: Optional[str] = None, codes: Optional[Iterable[str]] = None,
+			regions: Optional[Iterable[str]] = None, batch_size: int = 1000) -> Iterator[data_entities.DataSeries]:
+		"""
+			Streams the matching series from the database. Rows are fetched `batch_size` at a time, so the full
+			result is never held in memory.
+		Parameters
+		----------
+		report: Optional[str]
+			Only return series from this report.
+		codes: Optional[Iterable[str]]
+			Only return series with these codes.
+		regions: Optional[Iterable[str]]
+			Only return series from these regions, given as codes in the 'standard' namespace.
+		batch_size: int; default 1000
 
-		return session
+		Returns
+		-------
+		Iterator[DataSeries]
+		"""
+		query = select(
+			SERIES.c.id, SERIES.c.code, SERIES.c.description, SERIES.c.name, SERIES.c.notes, SERIES.c.units,
+			SERIES.c._scale_code, SERIES.c.packed,
+			REGION_CODES.c.value.label('region_code'), REGIONS.c.name.label('region_name'),
+			REGIONS.c.type.label('region_type'),
+			REPORTS.c.name.label('report_name'), REPORTS.c.date, REPORTS.c.url, REPORTS.c.agency, REPORTS.c.day_of_year
+		).select_from(SERIES) \
+			.join(REGIONS, REGIONS.c.id == SERIES.c._region_id) \
+			.join(REGION_CODE_LINKS, REGION_CODE_LINKS.c.region_id == REGIONS.c.id) \
+			.join(REGION_CODES, REGION_CODES.c.id == REGION_CODE_LINKS.c.region_code) \
+			.join(NAMESPACES, NAMESPACES.c.id == REGION_CODES.c._namespace_id) \
+			.join(REPORTS, REPORTS.c.name == SERIES.c._report_name) \
+			.where(NAMESPACES.c.name == STANDARD_NAMESPACE) \
+			.order_by(SERIES.c.id)
+		if report is not None:
+			query = query.where(SERIES.c._report_name == report)
 
-	def get_region(self, code: str) -> sqlentities.Region:
-		pass
+		with self.engine.connect() as connection:
+			# Long code/region lists are split into several queries. Each one is ordered by id.
+			for code_chunk, region_chunk in _filter_chunks(codes, regions):
+				chunk_query = query
+				if code_chunk is not None:
+					chunk_query = chunk_query.where(SERIES.c.code.in_(code_chunk))
+				if region_chunk is not None:
+					chunk_query = chunk_query.where(REGION_CODES.c.value.in_(region_chunk))
 
-	def get_report(self, name: str) -> sqlentities.Report:
-		raise NotImplementedError
+				result = connection.execution_options(yield_per = batch_size).execute(chunk_query)
+				for rows in result.partitions():
+					tags = self._get_tags(connection, [row.id for row in rows])
+					for row in rows:
+						yield self._load_series(row, tags.get(row.id, []))
 
-	def get_scale(self) -> sqlentities.Scale:
-		raise NotImplementedError
+	def _get_tags(self, connection: Connection, series_ids: List[int]) -> Dict[int, List[str]]:
+		tags = dict()
+		for chunk in _chunks(series_ids):
+			query = select(SERIES_TAGS.c.series_id, SERIES_TAGS.c.tag).where(SERIES_TAGS.c.series_id.in_(chunk))
+			for series_id, tag in connection.execute(query):
+				tags.setdefault(series_id, list()).append(tag)
+		return tags
 
-	def get_series(self) -> sqlentities.Series:
-		raise NotImplementedError
+	@staticmethod
+	def _load_series(row, tags: List[str]) -> data_entities.DataSeries:
+		years, values = series_encoding.unpack_series(row.packed)
+		return data_entities.DataSeries(
+			primarykey = (row.report_name, row.region_code, row.code),
+			code = row.code,
+			description = row.description,
+			name = row.name,
+			notes = row.notes,
+			region = data_entities.DataRegion(code = row.region_code, name = row.region_name, type = row.region_type),
+			report = {
+				'name':      row.report_name,
+				'date':      row.date,
+				'url':       row.url,
+				'agency':    row.agency,
+				'dayOfYear': row.day_of_year
+			},
+			scale = row._scale_code,
+			units = row.units,
+			tags = sorted(tags),
+			data = pandas.Series(values, index = years)
+		)
@@ -1,8 +1,11 @@
 
-from sqlalchemy import Column, Date, Float, Integer, String, Text, ForeignKey, Table
+from sqlalchemy import Column, Date, Float, Index, Integer, LargeBinary, String, Text, ForeignKey, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from sqlalchemy.ext.declarative import declarative_base
+import pandas
+
+from pyregions.database import series_encoding
 
 # String constrains the length of our str objects. Since Text is unbounded, it is probably preferable.
 # However, String may make table operations faster.
@@ -15,6 +18,12 @@ _intermediate_table_region_regioncode = Table(
 	Column('region_code', ForeignKey('regioncodes.id'))
 )
 
+_intermediate_table_series_tag = Table(
+	'seriestags', EntityBase.metadata,
+	Column('series_id', ForeignKey('series.id', ondelete = 'CASCADE'), primary_key = True),
+	Column('tag', ForeignKey('tags.value'), primary_key = True, index = True)
+)
+
 class Namespace(EntityBase):
 	__tablename__ = "namespaces"
 	id = Column(Integer, primary_key = True)
@@ -28,10 +37,12 @@ class Namespace(EntityBase):
 class RegionCode(EntityBase):
 	__tablename__ = 'regioncodes'
 	id = Column(Integer, primary_key = True)
-	value: str = Column(Text)
+	value: str = Column(Text, index = True)
 	_namespace_id = Column(Integer, ForeignKey(Namespace.id))
 	namespace = relationship("Namespace", back_populates = "codes")
 	region = relationship('Region', secondary = _intermediate_table_region_regioncode, back_populates = 'codes')
+	__table_args__ = (Index('ix_regioncodes_namespace_value', _namespace_id, value),)
+
 	def __repr__(self) -> str:
 		s = f"RegionCode(value = '{self.value}')"
 		return s
@@ -42,12 +53,10 @@ class Region(EntityBase):
 
 	id = Column(Integer, primary_key = True)
 
-	name = Column(Text)
+	name = Column(Text, index = True)
 	type = Column(Text)
 	codes = relationship('RegionCode', secondary = _intermediate_table_region_regioncode, back_populates = 'region')
-
-	# TODO: Add alias
-
+	series = relationship('Series', back_populates = 'region')
 
 	# TODO: Add alias
 
@@ -55,74 +64,90 @@ class Region(EntityBase):
 		string = f"Region(name = '{self.name}', type = '{self.type}')"
 		return string
 
-	def series(self):
-		raise NotImplementedError
-
 
 class Report(EntityBase):
 	__tablename__ = "reports"
 	name = Column(Text, primary_key = True)
-	date = Column(Date)
+	date = Column(Date, index = True)
 	url = Column(Text)
 	agency = Column(Text)
 	# Used to indicate the day of year that the dataset corresponds to.
 	# Ex. census data starts mid-year.
 
 	day_of_year = Column(Integer)
+	series = relationship('Series', back_populates = 'report')
 
 	def __repr__(self) -> str:
 		s = f"Report(date = '{self.date}', name = '{self.name}', agency = '{self.agency}')"
 		return s
 
-	def series(self):
-		raise NotImplementedError
-
 
 class Series(EntityBase):
 	__tablename__ = "series"
 	id = Column(Integer, primary_key = True)
 
-	code = Column(Text)
+	code = Column(Text, index = True)
 	description = Column(Text)
 	name = Column(Text)
 	notes = Column(Text)
 	units = Column(Text)
 
+	_region_id = Column(Integer, ForeignKey('regions.id'), nullable = False, index = True)
+	_report_name = Column(Text, ForeignKey('reports.name'), nullable = False)
+	_scale_code = Column(String(10), ForeignKey('scale.code'), nullable = False)
+	# The years and values of the series, encoded with `series_encoding.pack_series`.
+	packed = Column(LargeBinary, nullable = False)
+
+	region = relationship('Region', back_populates = 'series')
+	report = relationship('Report', back_populates = 'series')
+	scale = relationship('Scale', back_populates = 'series')
+	tags = relationship('Tag', secondary = _intermediate_table_series_tag, back_populates = 'series')
+	observations = relationship('Observation', back_populates = 'series')
+
+	__table_args__ = (UniqueConstraint(_report_name, _region_id, code),)
 
 	def __repr__(self) -> str:
 		s = f"Series(code = '{self.code}', name = '{self.name}', units = '{self.units}')"
 		return s
 
-	def region(self):
-		raise NotImplementedError
-
-	def report(self):
-		raise NotImplementedError
+	def get_data(self) -> pandas.Series:
+		years, values = series_encoding.unpack_series(self.packed)
+		return pandas.Series(values, index = years)
 
-	def scale(self):
-		raise NotImplementedError
 
-	def tags(self):
-		raise NotImplementedError
+class Observation(EntityBase):
+	""" One value of a series. Only stored when the database is opened with `store_observations = True`."""
+	__tablename__ = "observations"
+	series_id = Column(Integer, ForeignKey('series.id', ondelete = 'CASCADE'), primary_key = True)
+	timepoint = Column(Integer, primary_key = True)
+	value = Column(Float, nullable = False)
+	series = relationship('Series', back_populates = 'observations')
 
-	def years(self):
-		raise NotImplementedError
+	# Used to select a single timepoint across every series.
+	__table_args__ = (Index('ix_observations_timepoint_series', timepoint, series_id),)
 
-	def values(self):
-		raise NotImplementedError
+	def __repr__(self) -> str:
+		return f"Observation(timepoint = {self.timepoint}, value = {self.value})"
 
 
 class Scale(EntityBase):
 	__tablename__ = "scale"
 	code = Column(String(10), primary_key = True)
 	multiplier = Column(Float)
+	series = relationship('Series', back_populates = 'scale')
 
 	def __repr__(self) -> str:
 		s = f"Scale(code = {self.code}, multiplier = {self.multiplier})"
 		return s
 
-	def series(self):
-		raise NotImplementedError
+
+class Tag(EntityBase):
+	__tablename__ = "tags"
+	value = Column(Text, primary_key = True)
+	series = relationship('Series', secondary = _intermediate_table_series_tag, back_populates = 'tags')
+
+	def __repr__(self) -> str:
+		return f"Tag(value = '{self.value}')"
 
 
 if __name__ == "__main__":
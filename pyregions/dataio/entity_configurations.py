@@ -63,7 +63,7 @@ namespaces = {
 		'code':     'NUTS',
 		'name':     "Classification of Territorial Units for Statistics",
 		'subTypes': "NUTS-1,NUTS-2,NUTS-3",
-		'regex':    "(?P<nuts-1>[A-Z]{2}[0-9A-N])|(?P<nuts-2>[A-Z]{2}[0-9A-N]{2})|(?P<nuts-3>[A-Z]{2}[0-9A-N]{3}",
+		'regex':    "(?P<nuts-1>[A-Z]{2}[0-9A-N])|(?P<nuts-2>[A-Z]{2}[0-9A-N]{2})|(?P<nuts-3>[A-Z]{2}[0-9A-N]{3})",
 		'url':      "http://ec.europa.eu/eurostat/web/nuts/overview",
 		'wiki':     "https://en.wikipedia.org/wiki/Nomenclature_of_Territorial_Units_for_Statistics",
 		'agency':   'EUR'
@@ -71,7 +71,7 @@ namespaces = {
 	"Federal Information Processing Standards":           {
 		'code':   'FIPS',
 		'name':   "Federal Information Processing Standards",
-		'regex':  "(?P<state>[\d]{2})(?P<county>[\d]{3})",
+		'regex':  r"(?P<state>[\d]{2})(?P<county>[\d]{3})",
 		'url':    "https://www.census.gov/geo/reference/codes/cou.html",
 		'wiki':   "https://en.wikipedia.org/wiki/Federal_Information_Processing_Standards",
 		'agency': "FED"
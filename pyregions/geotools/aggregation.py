@@ -0,0 +1,136 @@
+"""
+	Aggregates regional data into groups of regions (ex. the UN geoschemes) with a single matrix product per table.
+"""
+from typing import Dict, List, Optional, Union
+
+import numpy
+import pandas
+
+from pyregions.dataio.composite_region_configurations import UN_Geoschemes
+
+METHODS = ['sum', 'mean', 'weighted_mean']
+
+
+def membership_matrix(groups: Dict[str, List[str]], regions: List[str]) -> numpy.ndarray:
+	"""
+		Builds a group x region indicator matrix.
+	Parameters
+	----------
+	groups: Dict[str, List[str]]
+		Maps each group to the codes of its member regions.
+	regions: List[str]
+		The region codes, in the order of the matrix columns. Members which are not in `regions` are ignored.
+
+	Returns
+	-------
+	numpy.ndarray
+		`matrix[i, j]` is 1 if the j-th region is a member of the i-th group, otherwise 0.
+	"""
+	index = pandas.Index(regions)
+	matrix = numpy.zeros((len(groups), len(index)))
+	for row, members in enumerate(groups.values()):
+		positions = index.get_indexer(members)
+		matrix[row, positions[positions >= 0]] = 1
+	return matrix
+
+
+class RegionAggregator:
+	"""
+		Computes sums and means of every group of regions at once.
+	Parameters
+	----------
+	groups: Optional[Dict[str, List[str]]]
+		Maps each group to the codes of its member regions. Defaults to the UN geoschemes.
+	"""
+
+	def __init__(self, groups: Optional[Dict[str, List[str]]] = None):
+		self.groups: Dict[str, List[str]] = dict(UN_Geoschemes if groups is None else groups)
+
+	def aggregate(self, table: pandas.DataFrame, how: str = 'sum',
+			weights: Union[pandas.DataFrame, pandas.Series, None] = None, level: Union[int, str] = 0,
+			skipna: bool = True) -> pandas.DataFrame:
+		"""
+			Aggregates a region x year table into every group.
+		Parameters
+		----------
+		table: pandas.DataFrame
+			- Columns -> the timepoints
+			- Index -> the region codes, or a MultiIndex such as the (`regionCode`, `seriesCode`) panel returned by the
+				region database. Every series is aggregated in the same matrix product.
+		how: {'sum', 'mean', 'weighted_mean'}; default 'sum'
+		weights: Union[pandas.DataFrame, pandas.Series, None]
+			Required for `weighted_mean`, ex. the population of each region. Either a region x year table with the
+			same columns as `table` or a single weight for each region.
+		level: Union[int, str]; default 0
+			The index level with the region codes.
+		skipna: bool; default True
+			If `False`, a group is NaN in any year where one of its members in `table` is NaN. Members which are not in
+			`table` at all are always ignored.
+
+		Returns
+		-------
+		pandas.DataFrame
+			The same layout as `table`, with the region codes replaced by the group names. Groups without any values
+			in a given year are NaN.
+		"""
+		if how not in METHODS:
+			message = f"Unsupported aggregation method '{how}'. Expected one of {METHODS}"
+			raise ValueError(message)
+		if how == 'weighted_mean' and weights is None:
+			message = "A weighted mean requires `weights`."
+			raise ValueError(message)
+
+		# Move any other index levels into the columns so that the whole panel is a single region x column matrix.
+		other_levels = list()
+		if isinstance(table.index, pandas.MultiIndex):
+			level_name = table.index.names[level] if isinstance(level, int) else level
+			other_levels = [name for name in table.index.names if name != level_name]
+			wide = table.unstack(other_levels)
+		else:
+			level_name = table.index.name
+			wide = table
+
+		matrix = membership_matrix(self.groups, wide.index.tolist())
+		values = wide.to_numpy(dtype = float)
+		present = ~numpy.isnan(values)
+		values = numpy.where(present, values, 0)
+
+		if how == 'weighted_mean':
+			weight_values = self._get_weights(weights, wide, other_levels)
+			totals = matrix @ (values * weight_values)
+			counts = matrix @ (present * weight_values)
+		else:
+			totals = matrix @ values
+			counts = matrix @ present
+
+		with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+			result = totals if how == 'sum' else totals / counts
+		invalid = counts == 0
+		if not skipna:
+			invalid |= (matrix @ ~present) > 0
+		result[invalid] = numpy.nan
+
+		index = pandas.Index(list(self.groups), name = level_name)
+		result = pandas.DataFrame(result, index = index, columns = wide.columns)
+		if other_levels:
+			result = result.stack(other_levels)
+			result = result.reorder_levels(table.index.names)
+		return result
+
+	@staticmethod
+	def _get_weights(weights: Union[pandas.DataFrame, pandas.Series], wide: pandas.DataFrame,
+			other_levels: List[str]) -> numpy.ndarray:
+		""" Aligns `weights` to the region x column matrix. Missing weights are treated as 0."""
+		if isinstance(weights, pandas.Series):
+			aligned = weights.reindex(wide.index).to_numpy(dtype = float)[:, numpy.newaxis]
+			aligned = numpy.broadcast_to(aligned, wide.shape)
+		else:
+			timepoints = wide.columns.droplevel(other_levels) if other_levels else wide.columns
+			aligned = weights.reindex(index = wide.index, columns = timepoints).to_numpy(dtype = float)
+		return numpy.nan_to_num(aligned, nan = 0.0)
+
+
+def aggregate_geoschemes(table: pandas.DataFrame, how: str = 'sum',
+		weights: Union[pandas.DataFrame, pandas.Series, None] = None, skipna: bool = True) -> pandas.DataFrame:
+	""" Aggregates a region x year table into the UN geoschemes. See `RegionAggregator.aggregate`."""
+	return RegionAggregator().aggregate(table, how = how, weights = weights, skipna = skipna)
@@ -0,0 +1,250 @@
+"""
+	Infers the namespace of region codes from the patterns in `dataio.entity_configurations.namespaces`, so that
+	each code can be looked up in a single namespace rather than every one.
+
+	The subtype of a code is given by the named groups of the namespace pattern. Groups separated by `|` are
+	alternative subtypes (ex. `NUTS-1`, `NUTS-2`), while consecutive groups describe a hierarchy (ex. the `state`
+	and `county` parts of a FIPS code), where the deepest group which matched is the subtype.
+"""
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy
+import pandas
+
+from pyregions.dataio.composite_region_configurations import nuts_codes
+from pyregions.dataio.entity_configurations import namespaces as namespace_configurations
+
+# Codes must start with one of these prefixes to belong to the namespace.
+PREFIXES: Dict[str, List[str]] = {
+	'NUTS': nuts_codes
+}
+
+# The namespace used to look up each subtype, as named in `country_codes` and the region resolver.
+# Namespaces which are not listed use their lowercased code.
+LOOKUP_NAMESPACES: Dict[str, Dict[str, str]] = {
+	'ISO': {'iso3': 'iso3', 'iso2': 'iso2', 'numeric': 'ison'}
+}
+
+
+class CodePattern(NamedTuple):
+	namespace: str
+	pattern: 're.Pattern'
+	# Maps the group names used in `pattern` to the subtype names in the configuration.
+	subtypes: Dict[str, str]
+	prefixes: Optional[Tuple[str, ...]]
+
+
+def _scan(pattern: str) -> Iterable[Tuple[int, str, int]]:
+	""" Yields the position, character and parenthesis depth of every character outside of escapes and character classes."""
+	depth = 0
+	index = 0
+	in_class = False
+	while index < len(pattern):
+		character = pattern[index]
+		if character == '\\':
+			index += 2
+			continue
+		if in_class:
+			in_class = character != ']'
+		elif character == '[':
+			in_class = True
+		elif character == '(':
+			yield index, character, depth
+			depth += 1
+		elif character == ')':
+			depth -= 1
+			yield index, character, depth
+		else:
+			yield index, character, depth
+		index += 1
+	if depth != 0 or in_class:
+		message = f"Unbalanced pattern: '{pattern}'"
+		raise ValueError(message)
+
+
+def _split_alternatives(pattern: str) -> List[str]:
+	""" Splits a pattern on the `|` characters which are not inside a group."""
+	positions = [index for index, character, depth in _scan(pattern) if character == '|' and depth == 0]
+	bounds = zip([-1] + positions, positions + [len(pattern)])
+	return [pattern[start + 1:end] for start, end in bounds]
+
+
+def _split_groups(pattern: str) -> Optional[List[str]]:
+	""" Splits a pattern made of consecutive top-level groups into those groups. Returns `None` for any other pattern."""
+	groups = list()
+	start = 0
+	for index, character, depth in _scan(pattern):
+		if depth != 0:
+			continue
+		if character == '(' and index == start:
+			continue
+		if character == ')':
+			groups.append(pattern[start:index + 1])
+			start = index + 1
+		elif character != '(':
+			return None
+	if start != len(pattern) or not groups:
+		return None
+	return groups
+
+
+def compile_pattern(regex: str) -> Tuple[str, Dict[str, str]]:
+	"""
+		Converts a namespace pattern from the entity configurations into a valid python pattern.
+	Parameters
+	----------
+	regex: str
+		ex. `"(?P<nuts-1>[A-Z]{2}[0-9A-N])|(?P<nuts-2>[A-Z]{2}[0-9A-N]{2})"`
+
+	Returns
+	-------
+	Tuple[str, Dict[str, str]]
+		- The pattern. Group names are converted to identifiers and the trailing groups of a hierarchy are optional,
+			so that `(?P<state>..)(?P<county>..)` also matches a state code on its own.
+		- Maps each group name in the pattern to the subtype name in `regex`.
+	"""
+	subtypes = dict()
+
+	def _rename(match) -> str:
+		name = re.sub(r'\W', '_', match.group(1))
+		subtypes[name] = match.group(1)
+		return f'(?P<{name}>'
+
+	pattern = re.sub(r'\(\?P<([^>]+)>', _rename, regex)
+
+	alternatives = list()
+	for alternative in _split_alternatives(pattern):
+		groups = _split_groups(alternative)
+		if groups and len(groups) > 1:
+			alternative = groups[0] + ''.join(f'(?:{group}' for group in groups[1:]) + ')?' * (len(groups) - 1)
+		alternatives.append(alternative)
+	pattern = '|'.join(alternatives)
+
+	try:
+		re.compile(pattern)
+	except re.error as exception:
+		message = f"Invalid namespace pattern '{regex}': {exception}"
+		raise ValueError(message)
+	return pattern, subtypes
+
+
+class CodeClassifier:
+	"""
+		Classifies region codes by namespace and subtype.
+	Parameters
+	----------
+	namespaces: Optional[Dict[str, Dict[str, str]]]
+		The namespace configurations. Defaults to `entity_configurations.namespaces`. Namespaces without a `regex`
+		are ignored. Earlier namespaces are preferred when a code matches several namespaces equally well.
+	prefixes: Optional[Dict[str, List[str]]]
+		Restricts the codes of a namespace to the given prefixes. Defaults to `PREFIXES`.
+	"""
+
+	def __init__(self, namespaces: Optional[Dict[str, Dict[str, str]]] = None,
+			prefixes: Optional[Dict[str, List[str]]] = None):
+		namespaces = namespace_configurations if namespaces is None else namespaces
+		prefixes = PREFIXES if prefixes is None else prefixes
+
+		self.patterns: List[CodePattern] = list()
+		for configuration in namespaces.values():
+			if 'regex' not in configuration: continue
+			code = configuration['code']
+			pattern, subtypes = compile_pattern(configuration['regex'])
+			namespace_prefixes = tuple(prefixes[code]) if code in prefixes else None
+			self.patterns.append(CodePattern(code, re.compile(pattern), subtypes, namespace_prefixes))
+
+	def match(self, values: pandas.Series) -> pandas.DataFrame:
+		"""
+			Checks which namespaces each value could belong to.
+		Parameters
+		----------
+		values: pandas.Series
+
+		Returns
+		-------
+		pandas.DataFrame
+			- Columns -> the namespace codes
+			- Index -> the index of `values`
+			- Values -> bool
+		"""
+		codes = values.astype(str).str.strip().str.upper()
+		present = values.notna().to_numpy()
+		result = dict()
+		for pattern in self.patterns:
+			matched = codes.str.fullmatch(pattern.pattern) & present
+			if pattern.prefixes:
+				matched &= codes.str.startswith(pattern.prefixes)
+			result[pattern.namespace] = matched.fillna(False).astype(bool)
+		return pandas.DataFrame(result, index = values.index, columns = [pattern.namespace for pattern in self.patterns])
+
+	def score(self, values: pandas.Series) -> pandas.Series:
+		""" Returns the fraction of `values` which match each namespace."""
+		if not isinstance(values, pandas.Series):
+			values = pandas.Series(values)
+		return self.match(values).mean().fillna(0.0)
+
+	def infer_namespace(self, values: pandas.Series) -> Optional[str]:
+		""" Returns the namespace which matches the most values, or `None` if no value matches any namespace."""
+		scores = self.score(values)
+		if scores.empty or scores.max() == 0:
+			return None
+		return scores.idxmax()
+
+	def classify(self, values: pandas.Series) -> pandas.DataFrame:
+		"""
+			Assigns each value to the namespace that matches the most values in the column among the namespaces it matches.
+		Parameters
+		----------
+		values: pandas.Series
+
+		Returns
+		-------
+		pandas.DataFrame
+			- Columns -> `namespace`, `subType`, `lookup` (the namespace to search, see `LOOKUP_NAMESPACES`)
+			- Index -> the index of `values`. Values which do not match any namespace are left as NaN.
+		"""
+		if not isinstance(values, pandas.Series):
+			values = pandas.Series(values)
+		columns = ['namespace', 'subType', 'lookup']
+		result = pandas.DataFrame(None, index = values.index, columns = columns, dtype = object)
+		if values.empty or not self.patterns:
+			return result
+
+		matches = self.match(values)
+		matrix = matches.to_numpy()
+		# Rank the namespaces by their score in this column, using the configuration order to break ties.
+		order = numpy.lexsort((numpy.arange(len(self.patterns)), -matrix.mean(axis = 0)))
+		ranks = numpy.empty(len(self.patterns))
+		ranks[order] = numpy.arange(len(self.patterns), 0, -1)
+		best = numpy.where(matrix, ranks, -numpy.inf).argmax(axis = 1)
+		found = matrix.any(axis = 1)
+
+		codes = values.astype(str).str.strip().str.upper()
+		for position, pattern in enumerate(self.patterns):
+			selected = found & (best == position)
+			if not selected.any(): continue
+			groups = codes[selected].str.extract(f'^(?:{pattern.pattern.pattern})$')
+			# The deepest group of a hierarchy is the last one which matched.
+			subtypes = groups.notna().iloc[:, ::-1].idxmax(axis = 1).map(pattern.subtypes)
+			lookups = LOOKUP_NAMESPACES.get(pattern.namespace, dict())
+			result.loc[selected, 'namespace'] = pattern.namespace
+			result.loc[selected, 'subType'] = subtypes.to_numpy()
+			result.loc[selected, 'lookup'] = subtypes.map(lambda s: lookups.get(s, pattern.namespace.lower())).to_numpy()
+		return result
+
+
+_CLASSIFIER: Optional[CodeClassifier] = None
+
+
+def get_classifier() -> CodeClassifier:
+	""" Returns the shared classifier, compiling the namespace patterns the first time it is requested."""
+	global _CLASSIFIER
+	if _CLASSIFIER is None:
+		_CLASSIFIER = CodeClassifier()
+	return _CLASSIFIER
+
+
+def classify(values: pandas.Series) -> pandas.DataFrame:
+	""" Classifies a column of region codes by namespace. See `CodeClassifier.classify`."""
+	return get_classifier().classify(values)
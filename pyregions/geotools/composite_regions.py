@@ -0,0 +1,251 @@
+"""
+	Evaluates the composite region definitions in `dataio.composite_region_configurations`.
+
+	Each definition maps `"<code>:<year>"` to the members of the composite from that year until the next definition
+	of the same composite. A member is either a single region code (ex. `"DEU"`, `"RUS-KGD"`) or an expression
+	such as `"PL2&PL4|PL21&PL22"`, where `&` joins several regions into one member and `|` separates alternative
+	encodings of that member in order of preference.
+"""
+from bisect import bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy
+import pandas
+
+from pyregions.dataio.composite_region_configurations import composite_regions
+
+
+class CompositeMember(NamedTuple):
+	label: str
+	# Each alternative is a group of region codes which together make up the member.
+	alternatives: Tuple[Tuple[str, ...], ...]
+
+	def resolve(self, available: Optional[Iterable[str]] = None) -> Optional[Tuple[str, ...]]:
+		""" Returns the first alternative whose regions are all in `available`, or the first alternative if no regions are given."""
+		if available is None:
+			return self.alternatives[0]
+		for alternative in self.alternatives:
+			if all(code in available for code in alternative):
+				return alternative
+		return None
+
+
+def parse_member(expression: str) -> CompositeMember:
+	"""
+		Parses a single member of a composite region definition.
+	Parameters
+	----------
+	expression: str
+		ex. `"DEU"`, `"DK03|DK032"`, `"FR413&FR421&FR422"`
+
+	Returns
+	-------
+	CompositeMember
+	"""
+	alternatives = list()
+	for alternative in expression.split('|'):
+		codes = tuple(code.strip() for code in alternative.split('&'))
+		if not all(codes):
+			message = f"Invalid composite region member: '{expression}'"
+			raise ValueError(message)
+		alternatives.append(codes)
+	return CompositeMember(expression, tuple(alternatives))
+
+
+class CompositeRegion:
+	"""
+		The membership of a single composite region over time.
+	Parameters
+	----------
+	code: str
+	name: str
+	snapshots: Dict[int, List[str]]
+		Maps the first year of each snapshot to its member expressions.
+	"""
+
+	def __init__(self, code: str, name: str, snapshots: Dict[int, List[str]]):
+		if not snapshots:
+			message = f"The composite region '{code}' has no definitions."
+			raise ValueError(message)
+		self.code = code
+		self.name = name
+		self.years: List[int] = sorted(snapshots)
+		self.snapshots: List[Tuple[CompositeMember, ...]] = [
+			tuple(parse_member(expression) for expression in snapshots[year]) for year in self.years
+		]
+
+	def __repr__(self) -> str:
+		return f"CompositeRegion('{self.code}', {self.years[0]}-)"
+
+	def get_snapshot(self, year: int) -> Optional[int]:
+		""" Returns the index of the snapshot which applies to `year`, or `None` if the composite did not exist yet."""
+		index = bisect_right(self.years, year) - 1
+		return index if index >= 0 else None
+
+	def members(self, year: int) -> Tuple[CompositeMember, ...]:
+		index = self.get_snapshot(year)
+		return self.snapshots[index] if index is not None else tuple()
+
+
+def _parse_definitions(definitions: Dict[str, Dict]) -> Dict[str, CompositeRegion]:
+	composites: Dict[str, CompositeRegion] = dict()
+	for key, definition in definitions.items():
+		snapshots: Dict[str, Dict[int, List[str]]] = dict()
+		for label, members in definition['definition'].items():
+			code, _, year = label.partition(':')
+			if not year.strip().isdigit():
+				message = f"Invalid composite region definition '{label}' in '{key}'. Expected '<code>:<year>'."
+				raise ValueError(message)
+			snapshots.setdefault(code, dict())[int(year)] = members
+
+		for code, years in snapshots.items():
+			if code in composites:
+				message = f"The composite region '{code}' is defined more than once."
+				raise ValueError(message)
+			composites[code] = CompositeRegion(code, definition.get('name', key), years)
+	return composites
+
+
+class CompositeRegions:
+	"""
+		Parses the composite region definitions once so that the members of a composite can be looked up for any year.
+	Parameters
+	----------
+	definitions: Dict[str, Dict]
+		Defaults to `composite_region_configurations.composite_regions`.
+	"""
+
+	def __init__(self, definitions: Optional[Dict[str, Dict]] = None):
+		self.composites = _parse_definitions(composite_regions if definitions is None else definitions)
+		# Composite regions can be referred to by code or by name.
+		self.names: Dict[str, str] = {composite.name.lower(): code for code, composite in self.composites.items()}
+
+	def __contains__(self, code: str) -> bool:
+		return code in self.composites or code.lower() in self.names
+
+	def __iter__(self):
+		return iter(self.composites.values())
+
+	def get(self, code: str) -> CompositeRegion:
+		composite = self.composites.get(code)
+		if composite is None and code.lower() in self.names:
+			composite = self.composites[self.names[code.lower()]]
+		if composite is None:
+			message = f"'{code}' is not a composite region."
+			raise ValueError(message)
+		return composite
+
+	def members(self, code: str, year: int) -> List[str]:
+		"""
+			Returns the member expressions of a composite region in the given year.
+		Parameters
+		----------
+		code: str
+			The code or name of the composite region.
+		year: int
+
+		Returns
+		-------
+		List[str]
+			Empty if the composite did not exist in `year`.
+		"""
+		return [member.label for member in self.get(code).members(year)]
+
+	def components(self, code: str, year: int, available: Optional[Iterable[str]] = None) -> List[str]:
+		"""
+			Returns the region codes which make up a composite region in the given year.
+		Parameters
+		----------
+		code: str
+		year: int
+		available: Optional[Iterable[str]]
+			The regions which have data. Each member uses its first alternative that only refers to available regions,
+			and members without such an alternative are skipped. By default, the first alternative is used.
+
+		Returns
+		-------
+		List[str]
+		"""
+		if available is not None:
+			available = set(available)
+		codes = list()
+		for member in self.get(code).members(year):
+			alternative = member.resolve(available)
+			if alternative:
+				codes += [region for region in alternative if region not in codes]
+		return codes
+
+	def aggregate(self, table: pandas.DataFrame, codes: Optional[List[str]] = None,
+			skipna: bool = False) -> pandas.DataFrame:
+		"""
+			Sums the values of each composite region for every year.
+		Parameters
+		----------
+		table: pandas.DataFrame
+			- Index -> region codes
+			- Columns -> years
+		codes: Optional[List[str]]
+			The composite regions to compute. Defaults to all of them.
+		skipna: bool; default False
+			If `False`, a total is NaN when any of its members is missing from `table` or is NaN in that year.
+			Otherwise only the available values are summed, and a total is NaN only when none of its members have a value.
+
+		Returns
+		-------
+		pandas.DataFrame
+			- Index -> composite region codes
+			- Columns -> the columns of `table`. Years before a composite region was first defined are NaN.
+		"""
+		composites = [self.get(code) for code in codes] if codes is not None else list(self.composites.values())
+		years = numpy.asarray(table.columns, dtype = int)
+		positions = {code: index for index, code in enumerate(table.index)}
+
+		# Stack the snapshots of every composite into a single snapshot x region membership matrix.
+		snapshot_count = sum(len(composite.snapshots) for composite in composites)
+		membership = numpy.zeros((snapshot_count, len(positions)))
+		unresolved = numpy.zeros(snapshot_count, dtype = bool)
+		# The row of `membership` which applies to each composite and year. -1 if the composite did not exist.
+		rows = numpy.empty((len(composites), len(years)), dtype = int)
+
+		offset = 0
+		for index, composite in enumerate(composites):
+			for snapshot, members in enumerate(composite.snapshots, start = offset):
+				for member in members:
+					alternative = member.resolve(positions)
+					if alternative is None:
+						unresolved[snapshot] = True
+					else:
+						membership[snapshot, [positions[code] for code in alternative]] = 1
+			indices = numpy.searchsorted(composite.years, years, side = 'right') - 1
+			rows[index] = numpy.where(indices >= 0, indices + offset, -1)
+			offset += len(composite.snapshots)
+
+		values = table.to_numpy(dtype = float)
+		missing = numpy.isnan(values)
+		totals = membership @ numpy.where(missing, 0, values)
+		if skipna:
+			invalid = (membership @ ~missing) == 0
+		else:
+			invalid = ((membership @ missing) > 0) | unresolved[:, numpy.newaxis]
+
+		columns = numpy.arange(len(years))
+		result = totals[rows, columns]
+		result[(rows < 0) | invalid[rows, columns]] = numpy.nan
+
+		return pandas.DataFrame(result, index = [composite.code for composite in composites], columns = table.columns)
+
+
+_COMPOSITES: Optional[CompositeRegions] = None
+
+
+def get_composite_regions() -> CompositeRegions:
+	""" Returns the shared composite regions, parsing the definitions the first time they are requested."""
+	global _COMPOSITES
+	if _COMPOSITES is None:
+		_COMPOSITES = CompositeRegions()
+	return _COMPOSITES
+
+
+def members(code: str, year: int) -> List[str]:
+	""" Returns the member expressions of a composite region in the given year. See `CompositeRegions.members`."""
+	return get_composite_regions().members(code, year)
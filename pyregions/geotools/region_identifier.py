@@ -2,21 +2,25 @@
 Implements a method of identifying a specific region based on name/country code and returns the iso-3 formatted code
 for that region.
 """
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 import pandas
 import yaml
-from fuzzywuzzy import process
+from pyregions.geotools.code_classifier import get_classifier
+from pyregions.utilities.fuzzy_index import FuzzyIndex, SearchResult
 
 DATA_FOLDER: Path = Path(__file__).parent / "data"
 namespace_folder = DATA_FOLDER / "namespaces"
-def _load_region_aliases()->pandas.DataFrame:
-	alias_filename = DATA_FOLDER / "region_aliases.tsv"
-	df = pandas.read_csv(alias_filename, sep = '\t')
+alias_filename = DATA_FOLDER / "region_aliases.tsv"
+
+
+def _load_region_aliases(filename: Path = alias_filename) -> pandas.DataFrame:
+	df = pandas.read_csv(filename, sep = '\t')
 	df = df.set_index('regionCode')
 	df['regionName'] = df['regionName'].str.lower()
 	return df
 
+
 def _load_namespace(filename: Path) -> pandas.DataFrame:
 	"""
 		Loads a file from the `namespaces` folder. Should ba a yaml file.
@@ -30,7 +34,7 @@ def _load_namespace(filename: Path) -> pandas.DataFrame:
 		- Columns-> `regionCode`, `regionName`
 		- Index-> `standardCode`
 	"""
-	data = yaml.load(filename.read_text())
+	data = yaml.safe_load(filename.read_text())
 	namespace = data['regionMap']
 	df = pandas.DataFrame.from_dict(namespace, orient = 'index')
 	df.index.name = 'standardCode'
@@ -38,15 +42,204 @@ def _load_namespace(filename: Path) -> pandas.DataFrame:
 	return df
 
 
-def _load_namespaces() -> pandas.DataFrame:
+def _load_namespaces(folder: Path = namespace_folder) -> pandas.DataFrame:
 	dfs = list()
-	for fn in namespace_folder.iterdir():
+	for fn in sorted(folder.iterdir()):
 		if fn.suffix == '.yaml':
 			dfs.append(_load_namespace(fn))
 	return pandas.concat(dfs)
 
 
-def identify(string: str, namespace: Optional[str] = None) -> Dict[str, str]:
+class RegionResolver:
+	"""
+		Loads the region namespaces once and keeps hash indexes of every code and name so that a region can be
+		identified without re-reading the namespace files.
+	Parameters
+	----------
+	folder: Path
+		The folder containing the namespace yaml files.
+	aliases: Path
+		The tsv file with alternative names for each region.
+	"""
+
+	def __init__(self, folder: Path = namespace_folder, aliases: Path = alias_filename):
+		self.namespace_folder = Path(folder)
+		self.alias_filename = Path(aliases)
+
+		# Maps the namespace name to a dict of lowercased codes/names and the matching standard code.
+		self.codes: Dict[str, Dict[str, str]] = dict()
+		self.names: Dict[str, Dict[str, str]] = dict()
+		# Maps the namespace name to a dict of standard codes and the (lowercased) region name.
+		self.standard_names: Dict[str, Dict[str, str]] = dict()
+
+		# Combined indexes used when no namespace is given. Earlier namespaces take priority.
+		self.all_codes: Dict[str, str] = dict()
+		self.all_names: Dict[str, str] = dict()
+		self.all_standard_names: Dict[str, str] = dict()
+
+		self._build_indexes(_load_namespaces(self.namespace_folder))
+		self._aliases: Optional[pandas.DataFrame] = None
+		self._alias_index: Optional[FuzzyIndex] = None
+
+	def _build_indexes(self, table: pandas.DataFrame):
+		standard_codes = table.index.tolist()
+		region_codes = table['regionCode'].astype(str).str.lower().tolist()
+		region_names = table['regionName'].astype(str).str.lower().tolist()
+		namespaces = table['namespace'].tolist()
+
+		for standard_code, code, name, namespace in zip(standard_codes, region_codes, region_names, namespaces):
+			# `setdefault` keeps the first match, which mirrors the previous list-based search.
+			self.codes.setdefault(namespace, dict()).setdefault(code, standard_code)
+			self.names.setdefault(namespace, dict()).setdefault(name, standard_code)
+			self.standard_names.setdefault(namespace, dict()).setdefault(standard_code, name)
+
+			self.all_codes.setdefault(code, standard_code)
+			self.all_names.setdefault(name, standard_code)
+			self.all_standard_names.setdefault(standard_code, name)
+
+	@property
+	def aliases(self) -> pandas.DataFrame:
+		""" The region alias table. Only loaded when an alias search is actually needed."""
+		if self._aliases is None:
+			self._aliases = _load_region_aliases(self.alias_filename)
+		return self._aliases
+
+	@property
+	def alias_index(self) -> FuzzyIndex:
+		""" Fuzzy index over every region alias and official region name."""
+		if self._alias_index is None:
+			aliases = self.aliases['regionName']
+			labels = aliases.tolist() + list(self.all_names.keys())
+			codes = aliases.index.tolist() + list(self.all_names.values())
+			self._alias_index = FuzzyIndex(labels, codes)
+		return self._alias_index
+
+	def search(self, string: str, limit: int = 5, score_cutoff: int = 0) -> List[SearchResult]:
+		"""
+			Searches the region aliases and names for the closest matches to `string`.
+		Parameters
+		----------
+		string: str
+		limit: int; default 5
+			The maximum number of matches to return.
+		score_cutoff: int; default 0
+			The minimum score of a match, between 0 and 100.
+
+		Returns
+		-------
+		List[Tuple[str, int, str]]
+			The matching alias, the score, and the standard code of the region.
+		"""
+		string = string.lower()  # To avoid differences due to capitalization.
+		return self.alias_index.search(string, limit, score_cutoff)
+
+	def search_aliases(self, string: str, score: int = 95) -> Optional[str]:
+		result = self.alias_index.extract_one(string.lower())
+		if result and result[1] > score:
+			return result[2]
+		else:
+			return None
+
+	def identify(self, string: str, namespace: Optional[str] = None) -> Optional[Dict[str, str]]:
+		"""
+			Identifies a region and returns the common name and iso-3 formatted region code.
+		Parameters
+		----------
+		string:str
+		namespace:Optional[str]
+			Restricts the code search to the supplied namespace.
+
+		Returns
+		-------
+		Dict[str,str]
+		- 'regionName': common name
+		- 'regionCode': region code
+		"""
+		string = string.lower()
+		if namespace:
+			codes = self.codes.get(namespace, dict())
+			names = self.names.get(namespace, dict())
+			standard_names = self.standard_names.get(namespace, dict())
+		else:
+			codes = self.all_codes
+			names = self.all_names
+			standard_names = self.all_standard_names
+
+		# Check if the given string is a valid code.
+		region_code = codes.get(string)
+		if region_code is None:
+			region_code = names.get(string)
+		if region_code is None:
+			region_code = self.search_aliases(string)
+
+		if region_code and region_code in standard_names:
+			result = {
+				'regionName': standard_names[region_code],
+				'regionCode': region_code.upper()
+			}
+		else:
+			result = None
+		return result
+
+	def _identify_code(self, string: str, namespace: Optional[str]) -> Optional[Dict[str, str]]:
+		""" Checks the codes of `namespace` first, if it has been loaded, before searching every namespace."""
+		if isinstance(namespace, str) and namespace in self.codes:
+			region_code = self.codes[namespace].get(string.lower())
+			standard_names = self.standard_names[namespace]
+			if region_code in standard_names:
+				return {
+					'regionName': standard_names[region_code],
+					'regionCode': region_code.upper()
+				}
+		return self.identify(string)
+
+	def identify_many(self, values: pandas.Series, namespace: Optional[str] = None) -> pandas.DataFrame:
+		"""
+			Identifies every label in `values`. Each distinct label is only resolved once.
+		Parameters
+		----------
+		values: pandas.Series
+		namespace: Optional[str]
+			Restricts the code search to the supplied namespace.
+
+		Returns
+		-------
+		pandas.DataFrame
+			- Columns -> `regionName`, `regionCode`
+			- Index -> the index of `values`. Labels which could not be identified are left as NaN.
+		"""
+		if not isinstance(values, pandas.Series):
+			values = pandas.Series(values)
+
+		# `positions` maps each element of `values` to its label in `labels`. Missing values are given -1.
+		positions, labels = pandas.factorize(values)
+		if namespace:
+			records = [self.identify(str(label), namespace) for label in labels]
+		else:
+			# Search the namespace each code most likely belongs to first, and only fall back to every namespace if
+			# the code is not found there.
+			lookups = get_classifier().classify(pandas.Series(labels, dtype = object))['lookup']
+			records = [self._identify_code(str(label), lookup) for label, lookup in zip(labels, lookups)]
+		records = [(record['regionName'], record['regionCode']) if record else (None, None) for record in records]
+		lookup = pandas.DataFrame.from_records(records, columns = ['regionName', 'regionCode'])
+
+		result = lookup.reindex(positions)
+		result.index = values.index
+		return result
+
+
+_RESOLVER: Optional[RegionResolver] = None
+
+
+def get_resolver() -> RegionResolver:
+	""" Returns the shared resolver, building it the first time it is requested."""
+	global _RESOLVER
+	if _RESOLVER is None:
+		_RESOLVER = RegionResolver()
+	return _RESOLVER
+
+
+def identify(string: str, namespace: Optional[str] = None) -> Optional[Dict[str, str]]:
 	"""
 		Identifies a region and returns the common name and iso-3 formatted region code.
 	Parameters
@@ -57,43 +250,32 @@ def identify(string: str, namespace: Optional[str] = None) -> Dict[str, str]:
 
 	Returns
 	-------
-	Tuple[str,str]
-	- common name
-	- region code
+	Dict[str,str]
+	- 'regionName': common name
+	- 'regionCode': region code
+	"""
+	return get_resolver().identify(string, namespace)
+
+
+def identify_many(values: pandas.Series, namespace: Optional[str] = None) -> pandas.DataFrame:
+	"""
+		Identifies every label in a column. See `RegionResolver.identify_many`.
+	Parameters
+	----------
+	values: pandas.Series
+	namespace:Optional[str]
+		Restricts the code search to the supplied namespace.
+
+	Returns
+	-------
+	pandas.DataFrame
+		`regionName` and `regionCode` columns aligned to the index of `values`.
 	"""
-	string = string.lower()
-	namespaces = _load_namespaces()
-	if namespace:
-		regions = namespaces[namespaces['namespace'] == namespace]
-	else:
-		regions = namespaces
-	regions['regionName'] = regions['regionName'].str.lower()
-	regions['regionCode'] = regions['regionCode'].str.lower()
-	# Check if the given string is a valid code.
-	if string in regions['regionCode'].tolist():
-		region_code = regions.index[regions['regionCode'].tolist().index(string)]
-	elif string in regions['regionName'].tolist():
-		region_code =  regions.index[regions['regionName'].tolist().index(string)]
-	else:
-		region_code = search_aliases(string)
-	if region_code:
-		result = {
-			'regionName': regions.loc[region_code].iloc[0]['regionName'],
-			'regionCode': region_code.upper()
-		}
-	else:
-		result = None
-	return result
-
-
-def search_aliases(string: str) -> Optional[str]:
-	string = string.lower() # To avoid differences due to capitalization.
-	region_aliases = _load_region_aliases()
-	candidate, score, code = process.extractOne(string, region_aliases['regionName'])
-	if score > 95:
-		return code
-	else:
-		return None
+	return get_resolver().identify_many(values, namespace)
+
+
+def search_aliases(string: str, score: int = 95) -> Optional[str]:
+	return get_resolver().search_aliases(string, score)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from pony.orm import Database, PrimaryKey, Set, Required, Optional, StrArray
+from pony.orm import Database, PrimaryKey, Set, Required, Optional, StrArray, composite_index
 
 
 database_object = Database()
@@ -23,10 +23,23 @@ class Region(database_object.Entity):
 	parent = Optional('Region', reverse='subregions')
 	subregions = Set('Region', reverse='parent')
 
+	# Rows of the closure table. Maintained by `NamespaceDatabase.rebuild_closure`.
+	ancestor_links = Set('RegionClosure', reverse='descendant')
+	descendant_links = Set('RegionClosure', reverse='ancestor')
+
 
 class Code(database_object.Entity):
 	namespace = Required(Namespace)
 	value = Required(str)
 	PrimaryKey(namespace, value)
 
-	region = Required(Region)
\ No newline at end of file
+	region = Required(Region)
+
+
+class RegionClosure(database_object.Entity):
+	""" One row for every pair of regions where `ancestor` contains `descendant`, including each region itself."""
+	ancestor = Required(Region, reverse='descendant_links')
+	descendant = Required(Region, reverse='ancestor_links')
+	depth = Required(int)
+	PrimaryKey(ancestor, descendant)
+	composite_index(descendant, depth)
@@ -1,13 +1,88 @@
+import json
 from pathlib import Path
-from typing import Optional, Union, Any
+from typing import Optional, Union, Any, Dict, Iterable, Iterator, List
+import numpy
+import pandas
 from pyregions.dataio import datasets
-from pony.orm import ObjectNotFound, db_session
+from pony.orm import ObjectNotFound, db_session, flush, select
 from loguru import logger
 from . import entities
 
 NAMESPACE_PRIOIRTY = [
 
 ]
+# The default maximum number of parameters in a single sqlite statement.
+SQLITE_MAX_VARIABLES = 999
+
+ISO_DESCRIPTION = "Codes for the representation of names of countries and their subdivisions " \
+				  "– Part 1: Country codes[2] defines codes for the names of countries, " \
+				  "dependent territories, and special areas of geographical interest."
+NAMESPACE_ISO3 = {
+	'name':        "ISO 3166-1 alpha-3",
+	'url':         "https://www.iso.org/standard/63545.html",
+	'description': ISO_DESCRIPTION,
+	'wiki':        "https://en.wikipedia.org/wiki/List_of_ISO_3166_country_codes"
+}
+NAMESPACE_ISO2 = dict(NAMESPACE_ISO3, name = "ISO 3166-1 alpha-2")
+NAMESPACE_ISON = dict(NAMESPACE_ISO3, name = "ISO 3166-1 numeric")
+NAMESPACE_USPS = {
+	'name':        "United States Postal Abbreviations",
+	'url':         "https://www.stateabbreviations.us",
+	'description': "US Postal abbreviations are based on iso-3166 subdivision codes.",
+	'wiki':        "https://en.wikipedia.org/wiki/List_of_U.S._state_abbreviations"
+}
+
+# Raw sql used by `import_namespace_table`. The upsert variants update rows which already exist.
+SQL_INSERT_REGION = 'INSERT INTO "Region" ("name", "type", "aliases", "parent") VALUES (?, ?, ?, ?)'
+# Aliases are merged with the existing aliases, keeping their order. A region is never made its own parent.
+SQL_UPSERT_REGION = SQL_INSERT_REGION + """ ON CONFLICT ("name") DO UPDATE SET
+	"type" = "excluded"."type",
+	"aliases" = (
+		SELECT json_group_array("value") FROM (
+			SELECT "value", 0 AS "source", "key" FROM json_each(COALESCE("Region"."aliases", '[]'))
+			UNION ALL
+			SELECT "value", 1 AS "source", "key" FROM json_each("excluded"."aliases")
+			WHERE "value" NOT IN (SELECT "value" FROM json_each(COALESCE("Region"."aliases", '[]')))
+			ORDER BY "source", "key"
+		)
+	),
+	"parent" = CASE
+		WHEN "excluded"."parent" = "Region"."id" THEN "Region"."parent"
+		ELSE COALESCE("excluded"."parent", "Region"."parent")
+	END"""
+SQL_INSERT_CODE = 'INSERT INTO "Code" ("namespace", "value", "region") VALUES (?, ?, ?)'
+SQL_UPSERT_CODE = SQL_INSERT_CODE + \
+	' ON CONFLICT ("namespace", "value") DO UPDATE SET "region" = "excluded"."region"'
+
+# Stops the recursion if the parents of the regions form a cycle.
+MAX_REGION_DEPTH = 32
+SQL_BUILD_CLOSURE = """INSERT INTO "RegionClosure" ("ancestor", "descendant", "depth")
+	WITH RECURSIVE "tree" ("ancestor", "descendant", "depth") AS (
+		SELECT "id", "id", 0 FROM "Region"
+		UNION ALL
+		SELECT "tree"."ancestor", "Region"."id", "tree"."depth" + 1
+		FROM "tree" JOIN "Region" ON "Region"."parent" = "tree"."descendant"
+		WHERE "tree"."depth" < ?
+	)
+	SELECT "ancestor", "descendant", MIN("depth") FROM "tree" GROUP BY "tree"."ancestor", "tree"."descendant"
+"""
+
+
+def _chunks(values: List[Any], size: int = SQLITE_MAX_VARIABLES) -> Iterator[List[Any]]:
+	for index in range(0, len(values), size):
+		yield values[index:index + size]
+
+
+def _get_aliases(name: str, aliases: Any) -> List[str]:
+	if isinstance(aliases, str):
+		aliases = aliases.split('|')
+	elif not isinstance(aliases, (list, tuple)):
+		aliases = []
+	return _unique([name] + [alias.strip() for alias in aliases if isinstance(alias, str) and alias.strip()])
+
+
+def _unique(values: Iterable[Any]) -> List[Any]:
+	return list(dict.fromkeys(values))
 
 
 class BasicNamespaceDatabase:
@@ -19,6 +94,10 @@ class BasicNamespaceDatabase:
 		self.Namespace = entities.Namespace
 		self.Code = entities.Code
 		self.Region = entities.Region
+		self.RegionClosure = entities.RegionClosure
+
+		# Maps each namespace name to a dict of codes and region ids. Loaded the first time it is needed.
+		self._code_snapshot: Optional[Dict[str, Dict[str, int]]] = None
 
 	@db_session
 	def get_namespace(self, value: Union[str, entities.Namespace]) -> Optional[entities.Namespace]:
@@ -43,6 +122,133 @@ class BasicNamespaceDatabase:
 		if code_entity is not None:
 			return code_entity.region
 
+	@db_session
+	def resolve_codes(self, namespace: Union[str, entities.Namespace], values: Iterable[str]) -> Dict[str, entities.Region]:
+		"""
+			Finds the regions for many codes at once. Each batch of codes is resolved with one joined query, plus one
+			query to load the matching regions.
+		Parameters
+		----------
+		namespace: Union[str, entities.Namespace]
+		values: Iterable[str]
+			The codes to look up. Capitalization is ignored.
+
+		Returns
+		-------
+		Dict[str, entities.Region]
+			Maps each code which was found (as given) to its region. Codes which could not be found are left out.
+		"""
+		namespace_name = namespace if isinstance(namespace, str) else namespace.name
+		# Maps the uppercased codes to the codes as they were given.
+		keys: Dict[str, List[str]] = dict()
+		for value in values:
+			if is_valid_code(value):
+				keys.setdefault(value.upper(), list()).append(value)
+
+		result = dict()
+		for chunk in _chunks(list(keys)):
+			# `prefetch` loads the regions together rather than one at a time when they are first used.
+			query = select(
+				(c.value, c.region) for c in self.Code if c.namespace.name == namespace_name and c.value in chunk
+			).prefetch(self.Region)
+			for code, region in query:
+				for value in keys[code]:
+					result[value] = region
+		return result
+
+	@db_session
+	def refresh_code_snapshot(self) -> Dict[str, Dict[str, int]]:
+		""" Reloads the in-memory copy of the code table. Should be called after the codes are modified elsewhere."""
+		snapshot = dict()
+		for namespace_name, code, region_id in select((c.namespace.name, c.value, c.region.id) for c in self.Code):
+			snapshot.setdefault(namespace_name, dict())[code] = region_id
+		self._code_snapshot = snapshot
+		return snapshot
+
+	@property
+	def code_snapshot(self) -> Dict[str, Dict[str, int]]:
+		""" Maps each namespace name to a dict of codes and the id of the matching region."""
+		if self._code_snapshot is None:
+			self.refresh_code_snapshot()
+		return self._code_snapshot
+
+	def resolve_region_ids(self, namespace: str, values: Iterable[str]) -> pandas.Series:
+		"""
+			Converts a column of codes to region ids using the in-memory snapshot of the code table.
+		Parameters
+		----------
+		namespace: str
+			The name of the namespace.
+		values: Iterable[str]
+			The codes to convert. Capitalization is ignored.
+
+		Returns
+		-------
+		pandas.Series
+			The region id of each code as a nullable `Int64` series, aligned with `values`. Codes which could not be
+			found are `<NA>`.
+		"""
+		if not isinstance(values, pandas.Series):
+			values = pandas.Series(list(values), dtype = object)
+		codes = self.code_snapshot.get(namespace, dict())
+
+		# Each distinct code is only looked up once. Missing values are given the position -1, which selects the
+		# trailing NaN.
+		positions, labels = pandas.factorize(values)
+		lookup = [codes.get(label.upper(), numpy.nan) if is_valid_code(label) else numpy.nan for label in labels]
+		lookup = numpy.array(lookup + [numpy.nan], dtype = float)
+		return pandas.Series(lookup[positions], index = values.index).astype('Int64')
+
+	@db_session
+	def rebuild_closure(self) -> int:
+		"""
+			Recomputes the `RegionClosure` table from the `parent` of each region. Called by the bulk import methods;
+			should be called after changing `Region.parent` through the entities.
+
+		Returns
+		-------
+		int
+			The number of rows in the closure table.
+		"""
+		flush()
+		connection = self.database.get_connection()
+		connection.execute('DELETE FROM "RegionClosure"')
+		connection.execute(SQL_BUILD_CLOSURE, [MAX_REGION_DEPTH])
+		return connection.execute('SELECT COUNT(*) FROM "RegionClosure"').fetchone()[0]
+
+	@staticmethod
+	def _get_region_id(region: Union[int, entities.Region]) -> int:
+		return region if isinstance(region, int) else region.id
+
+	@db_session
+	def descendants(self, region: Union[int, entities.Region], include_self: bool = False) -> List[entities.Region]:
+		""" Returns every region contained in `region`, at any depth. Uses the closure table."""
+		region_id = self._get_region_id(region)
+		min_depth = 0 if include_self else 1
+		query = select(
+			r for r in self.Region for c in self.RegionClosure
+			if c.ancestor.id == region_id and c.descendant == r and c.depth >= min_depth
+		)
+		return list(query.order_by(lambda: (c.depth, r.id)))
+
+	@db_session
+	def ancestors(self, region: Union[int, entities.Region], include_self: bool = False) -> List[entities.Region]:
+		""" Returns every region containing `region`, starting with its parent. Uses the closure table."""
+		region_id = self._get_region_id(region)
+		min_depth = 0 if include_self else 1
+		query = select(
+			r for r in self.Region for c in self.RegionClosure
+			if c.descendant.id == region_id and c.ancestor == r and c.depth >= min_depth
+		)
+		return list(query.order_by(lambda: c.depth))
+
+	@db_session
+	def is_within(self, region: Union[int, entities.Region], other: Union[int, entities.Region]) -> bool:
+		""" Checks whether `region` is `other` or one of its descendants."""
+		ancestor_id = self._get_region_id(other)
+		descendant_id = self._get_region_id(region)
+		return self.RegionClosure.exists(lambda c: c.ancestor.id == ancestor_id and c.descendant.id == descendant_id)
+
 
 class NamespaceDatabase(BasicNamespaceDatabase):
 	"""
@@ -59,6 +265,7 @@ class NamespaceDatabase(BasicNamespaceDatabase):
 		# logger.debug(f"import_namespace_code({namespace.name}, {region.name}, {code})")
 		if not is_valid_code(code): return None
 		code = code.upper()
+		self._code_snapshot = None
 		result = self.Code(
 			namespace = namespace,
 			region = region,
@@ -71,61 +278,101 @@ class NamespaceDatabase(BasicNamespaceDatabase):
 		region.aliases.append(name)
 		return region
 
-	def import_iso(self):
-		""" ISO numerical codes are optional, so some will be NaN."""
-		table = datasets.get_namespace_iso()
-		description = "Codes for the representation of names of countries and their subdivisions " \
-					  "– Part 1: Country codes[2] defines codes for the names of countries, " \
-					  "dependent territories, and special areas of geographical interest."
-		namespace_iso3 = self.Namespace(
-			name = "ISO 3166-1 alpha-3",
-			url = "https://www.iso.org/standard/63545.html",
-			description = description,
-			wiki = "https://en.wikipedia.org/wiki/List_of_ISO_3166_country_codes"
-		)
-		namespace_iso2 = self.Namespace(
-			name = "ISO 3166-1 alpha-2",
-			url = "https://www.iso.org/standard/63545.html",
-			description = description,
-			wiki = "https://en.wikipedia.org/wiki/List_of_ISO_3166_country_codes"
-		)
-		namespace_ison = self.Namespace(
-			name = "ISO 3166-1 numeric",
-			url = "https://www.iso.org/standard/63545.html",
-			description = description,
-			wiki = "https://en.wikipedia.org/wiki/List_of_ISO_3166_country_codes"
-		)
+	def import_namespace_table(self, table: pandas.DataFrame, namespaces: Dict[str, Dict[str, str]],
+			name_column: str = 'regionName', type_column: str = 'regionType', parent: Optional[int] = None,
+			upsert: bool = True, alias_column: Optional[str] = None) -> Dict[str, int]:
+		"""
+			Imports a table of regions and their codes with batched sql in a single transaction.
+		Parameters
+		----------
+		table: pandas.DataFrame
+			One row per region.
+		namespaces: Dict[str, Dict[str, str]]
+			Maps each code column to the fields of its namespace ('name', 'url', 'description', 'wiki'). Namespaces
+			are matched by name and created if they do not exist.
+		name_column, type_column: str
+			The columns with the name and type of each region.
+		parent: Optional[int]
+			The id of the parent region of every region in the table. Ignored for the parent region itself.
+		upsert: bool; default True
+			If `True`, regions and codes which already exist are updated instead of raising an error, so the same
+			table can be imported again without duplicating rows. The aliases of existing regions are merged with the
+			new aliases.
+		alias_column: Optional[str]
+			A column with additional aliases for each region, given as a list or a '|'-delimited string. The name of
+			each region is always an alias.
 
-		for index, row in table.iterrows():
-			region = self.import_region(row['regionName'], row['regionType'])
+		Returns
+		-------
+		Dict[str, int]
+			The number of region and code rows written.
+		"""
+		table = table[table[name_column].map(lambda name: isinstance(name, str))]
+		names = table[name_column].tolist()
+		aliases = table[alias_column].tolist() if alias_column else [None] * len(names)
+		region_rows = [
+			(name, region_type, json.dumps(_get_aliases(name, alias)), parent)
+			for name, region_type, alias in zip(names, table[type_column].tolist(), aliases)
+		]
 
-			# Each code is optional, although most should be present.
+		with db_session:
+			# Regions created through pony in an enclosing session need to be written first.
+			flush()
+			connection = self.database.get_connection()
+			namespace_ids = {
+				column: self._get_or_create_namespace(connection, fields) for column, fields in namespaces.items()
+			}
+			connection.executemany(SQL_UPSERT_REGION if upsert else SQL_INSERT_REGION, region_rows)
 
-			self.import_namespace_code(namespace_iso2, region, row['iso2'])
-			self.import_namespace_code(namespace_iso3, region, row['iso3'])
-			self.import_namespace_code(namespace_ison, region, row['ison'])
+			region_ids = dict()
+			for chunk in _chunks(_unique(names)):
+				query = f'SELECT "name", "id" FROM "Region" WHERE "name" IN ({", ".join("?" * len(chunk))})'
+				region_ids.update(connection.execute(query, chunk).fetchall())
 
-	def import_usps(self):
-		table = datasets.get_namespace_usps()
-		description = "US Postal abbreviations are based on iso-3166 subdivision codes."
+			code_rows = list()
+			for column, namespace_id in namespace_ids.items():
+				for name, code in zip(names, table[column].tolist()):
+					if is_valid_code(code):
+						code_rows.append((namespace_id, code.upper(), region_ids[name]))
+			connection.executemany(SQL_UPSERT_CODE if upsert else SQL_INSERT_CODE, code_rows)
 
-		ns = self.Namespace(
-			name = "United States Postal Abbreviations",
-			url = "https://www.stateabbreviations.us",
-			description = description,
-			wiki = "https://en.wikipedia.org/wiki/List_of_U.S._state_abbreviations"
+		self._code_snapshot = None
+		self.rebuild_closure()
+		return {'regions': len(region_rows), 'codes': len(code_rows)}
+
+	@staticmethod
+	def _get_or_create_namespace(connection, fields: Dict[str, str]) -> int:
+		row = connection.execute('SELECT "id" FROM "Namespace" WHERE "name" = ?', [fields['name']]).fetchone()
+		if row is not None:
+			return row[0]
+		cursor = connection.execute(
+			'INSERT INTO "Namespace" ("name", "url", "wiki", "description") VALUES (?, ?, ?, ?)',
+			[fields['name'], fields.get('url', ''), fields.get('wiki', ''), fields.get('description', '')]
+		)
+		return cursor.lastrowid
+
+	def import_iso(self, upsert: bool = True):
+		""" ISO numerical codes are optional, so some will be NaN."""
+		table = datasets.get_namespace_iso()
+		self.import_namespace_table(
+			table,
+			{'iso2': NAMESPACE_ISO2, 'iso3': NAMESPACE_ISO3, 'ison': NAMESPACE_ISON},
+			upsert = upsert
 		)
-		# Since all of these regions are US states, territories, etc, they should be added under 'USA'
-		usa = self.get_region_from_code("USA", "ISO 3166-1 alpha-3")
-		if usa is None:
-			usa = self.import_region("United States", "country")
 
-		for index, row in table.iterrows():
-			region = self.import_region(row['regionName'], row['regionType'])
-			region.parent = usa
+	def import_usps(self, upsert: bool = True):
+		table = datasets.get_namespace_usps()
+
+		# Since all of these regions are US states, territories, etc, they should be added under 'USA'
+		with db_session:
+			usa = self.get_region_from_code("USA", NAMESPACE_ISO3['name'])
+			if usa is None:
+				usa = self.Region.get(name = "United States") or self.import_region("United States", "country")
+				flush()
+			usa_id = usa.id
 
-			# Ignore iso subdivision codes for now.
-			self.import_namespace_code(ns, region, row['usps'])
+		# Ignore iso subdivision codes for now.
+		self.import_namespace_table(table, {'usps': NAMESPACE_USPS}, parent = usa_id, upsert = upsert)
 
 
 def is_valid_code(value: Any) -> bool:
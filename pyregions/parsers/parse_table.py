@@ -1,6 +1,7 @@
 from pathlib import Path
-from typing import List, Mapping
+from typing import List, Mapping, Optional, Union
 
+import numpy
 import pandas
 from infotools import numbertools
 
@@ -56,15 +57,94 @@ def _convert_table_row_to_standard_series(row: Mapping[str, str], column_map: sd
 	return series
 
 
-def read_standard_table(path: Path, column_map: sd.RequiredColumns = sd.RequiredColumns()) -> List[sd.StandardSeries]:
-	""" Imports a table formatted with annual data in each column."""
+def _convert_year_columns(table: pandas.DataFrame) -> numpy.ndarray:
+	""" Converts the timepoint columns of a table into a 2-D float array. Values which are not numbers become NaN."""
+	block = table.to_numpy(dtype = object)
+	flat = block.ravel()
+	values = pandas.to_numeric(flat, errors = 'coerce').astype(float)
+
+	# Only cells which could not be converted directly need to be cleaned, ex. '1,245.34'.
+	missing = numpy.flatnonzero(numpy.isnan(values))
+	if len(missing):
+		cleaned = pandas.Series(flat[missing]).astype(str).str.replace(',', '', regex = False).str.strip()
+		values[missing] = pandas.to_numeric(cleaned, errors = 'coerce').values
+
+	return values.reshape(block.shape)
+
+
+def _optional_column(table: pandas.DataFrame, column: Optional[str], default) -> List:
+	""" Returns the values in an optional column, or a list filled with the result of `default()` if it is missing."""
+	if column is not None and column in table.columns:
+		return table[column].tolist()
+	return [default() for _ in range(len(table))]
+
+
+def _convert_table_to_standard_table(table: pandas.DataFrame, column_map: sd.RequiredColumns,
+		numeric_columns: Optional[List] = None) -> sd.StandardTable:
+	"""
+	Parses every row of a table into a standardized series. Produces the same series as calling
+	`_convert_table_row_to_standard_series` on each row, but converts each column once rather than each cell.
+	Parameters
+	----------
+	table: pandas.DataFrame
+	column_map: RequiredColumns
+	numeric_columns: Optional[List]
+		The timepoint columns. Detected from the table if not given.
+
+	Returns
+	-------
+	StandardTable
+	"""
+	if numeric_columns is None:
+		numeric_columns = get_numeric_columns(table.columns)
+	years = [int(i) for i in numeric_columns]
+	values = _convert_year_columns(table[numeric_columns])
+
+	# Tables usually only use a handful of scales, so each one is only parsed once.
+	scale_column = table[column_map.scale_column]
+	scales = {scale: numbertools.get_scale(scale).prefix for scale in scale_column.unique()}
+
+	metadata = pandas.DataFrame({
+		'region_name': table[column_map.region_name_column].tolist(),
+		'region_code': table[column_map.region_code_column].tolist(),
+		'series_name': table[column_map.name_column].tolist(),
+		'series_code': table[column_map.code_column].tolist(),
+		'scale':       scale_column.map(scales).tolist(),
+		'description': table[column_map.description_column].tolist(),
+		'notes':       _optional_column(table, column_map.note_column, str),
+		'units':       table[column_map.units_column].tolist(),
+		'tags':        _optional_column(table, column_map.tag_column, list)
+	})
+
+	return sd.StandardTable(metadata, years, values)
+
+
+def _convert_table_to_standard_series(table: pandas.DataFrame, column_map: sd.RequiredColumns,
+		numeric_columns: Optional[List] = None) -> List[sd.StandardSeries]:
+	""" Parses every row of a table into a standardized series. See `_convert_table_to_standard_table`."""
+	return _convert_table_to_standard_table(table, column_map, numeric_columns).to_series()
+
+
+def read_standard_table(path: Path, column_map: sd.RequiredColumns = sd.RequiredColumns(),
+		columnar: bool = False) -> Union[List[sd.StandardSeries], sd.StandardTable]:
+	"""
+		Imports a table formatted with annual data in each column.
+	Parameters
+	----------
+	path: Path
+	column_map: RequiredColumns
+	columnar: bool; default False
+		Returns a `StandardTable` instead of a list of `StandardSeries`.
+	"""
 	table, numeric_columns = get_table(path)
 
 	column_map.find_missing_columns(table.columns)
 
-	parsed_series = [_convert_table_row_to_standard_series(row, column_map) for _, row in table.iterrows()]
+	parsed_table = _convert_table_to_standard_table(table, column_map, numeric_columns)
+	if columnar:
+		return parsed_table
 
-	return parsed_series
+	return parsed_table.to_series()
 
 def read_standard_data(path:Path, report:Mapping[str,str])->sd.StandardData:
 	pass
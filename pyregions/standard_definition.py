@@ -1,8 +1,16 @@
+from array import array
 from dataclasses import asdict, dataclass, field
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy
+import pandas
 from infotools.timetools import Timestamp
 
+# The metadata fields of `StandardSeries`, in order.
+SERIES_METADATA = [
+	'region_name', 'region_code', 'series_name', 'series_code', 'scale', 'description', 'notes', 'units', 'tags'
+]
+
 
 @dataclass
 class RequiredColumns:
@@ -42,8 +50,10 @@ class RequiredColumns:
 		return missing_columns
 
 
+# The standard entities are created once per row of a table, so they use __slots__ to avoid a per-object __dict__.
 @dataclass
 class StandardRegion:
+	__slots__ = ('code', 'name', 'type')
 	code: str
 	name: str
 	type: str
@@ -51,6 +61,7 @@ class StandardRegion:
 
 @dataclass
 class StandardReport:
+	__slots__ = ('date', 'name', 'url', 'agency')
 	date: Timestamp
 	name: str
 	url: str
@@ -59,6 +70,7 @@ class StandardReport:
 
 @dataclass
 class StandardSeries:
+	__slots__ = SERIES_METADATA + ['values']
 	region_name: str
 	region_code: str
 	series_name: str
@@ -74,12 +86,191 @@ class StandardSeries:
 		return asdict(self)
 
 	def to_row(self) -> Dict[Union[int, str], Union[str, float]]:
+		""" Returns the series metadata along with one key for each timepoint."""
 		d = self.to_dict()
 
-		d.update(d.pop('series_values'))
+		d.update(d.pop('values'))
 		return d
 
 
+class CompactSeries:
+	"""
+		A memory-efficient alternative to `StandardSeries`. The timepoints and values are kept in two typed arrays
+		rather than a list of tuples. Accepts the same arguments as `StandardSeries`.
+	"""
+	__slots__ = SERIES_METADATA + ['years', 'array']
+
+	def __init__(self, region_name: str, region_code: str, series_name: str, series_code: str, scale: str,
+			description: str, notes: str, units: str, tags: List[str], values: Iterable[Tuple[int, float]]):
+		self.region_name = region_name
+		self.region_code = region_code
+		self.series_name = series_name
+		self.series_code = series_code
+		self.scale = scale
+		self.description = description
+		self.notes = notes
+		self.units = units
+		self.tags = tags
+
+		self.years: array = array('i')
+		self.array: array = array('d')
+		for year, value in values:
+			self.years.append(year)
+			self.array.append(value)
+
+	@classmethod
+	def from_series(cls, series: Union[StandardSeries, 'StandardSeriesView']) -> 'CompactSeries':
+		metadata = [getattr(series, name) for name in SERIES_METADATA]
+		return cls(*metadata, values = series.values)
+
+	@property
+	def values(self) -> List[Tuple[int, float]]:
+		return list(zip(self.years, self.array))
+
+	def to_series(self) -> StandardSeries:
+		metadata = [getattr(self, name) for name in SERIES_METADATA]
+		return StandardSeries(*metadata, values = self.values)
+
+	def to_dict(self) -> Dict[str, Union[str, List]]:
+		return self.to_series().to_dict()
+
+	def to_row(self) -> Dict[Union[int, str], Union[str, float]]:
+		return self.to_series().to_row()
+
+	def __eq__(self, other) -> bool:
+		if isinstance(other, (CompactSeries, StandardSeries)):
+			return self.to_dict() == other.to_dict()
+		return NotImplemented
+
+	def __repr__(self) -> str:
+		return f"CompactSeries(region_code = '{self.region_code}', series_code = '{self.series_code}')"
+
+
+def _metadata_property(index: int, doc: str) -> property:
+	return property(lambda self: self._metadata[index], doc = doc)
+
+
+class StandardSeriesView:
+	"""
+		A read-only series backed by one row of a `StandardTable`. Has the same attributes and methods as
+		`StandardSeries`, but the values are only converted to python objects when requested.
+	"""
+	__slots__ = ('_metadata', '_years', '_values')
+
+	def __init__(self, metadata: Tuple, years: numpy.ndarray, values: numpy.ndarray):
+		self._metadata = metadata
+		self._years = years
+		self._values = values
+
+	region_name = _metadata_property(0, "The name of the region.")
+	region_code = _metadata_property(1, "The code of the region.")
+	series_name = _metadata_property(2, "The name of the series.")
+	series_code = _metadata_property(3, "The code of the series.")
+	scale = _metadata_property(4, "The scale prefix of the series values.")
+	description = _metadata_property(5, "The series description.")
+	notes = _metadata_property(6, "The series notes.")
+	units = _metadata_property(7, "The series units.")
+	tags = _metadata_property(8, "The series tags.")
+
+	@property
+	def years(self) -> numpy.ndarray:
+		return self._years
+
+	@property
+	def array(self) -> numpy.ndarray:
+		""" The series values as a float array aligned with `years`."""
+		return self._values
+
+	@property
+	def values(self) -> List[Tuple[int, float]]:
+		return list(zip(self._years.tolist(), self._values.tolist()))
+
+	def to_series(self) -> StandardSeries:
+		return StandardSeries(*self._metadata, values = self.values)
+
+	def to_dict(self) -> Dict[str, Union[str, List]]:
+		return self.to_series().to_dict()
+
+	def to_row(self) -> Dict[Union[int, str], Union[str, float]]:
+		return self.to_series().to_row()
+
+	def __repr__(self) -> str:
+		return f"StandardSeriesView(region_code = '{self.region_code}', series_code = '{self.series_code}')"
+
+
+class StandardTable:
+	"""
+		Columnar storage for a collection of series which share the same timepoints.
+	Parameters
+	----------
+	metadata: pandas.DataFrame
+		One row per series. Must contain the columns in `SERIES_METADATA`.
+	years: Sequence[int]
+		The timepoints shared by every series.
+	values: numpy.ndarray
+		A (series x timepoints) array of values. Missing values are NaN.
+	"""
+
+	def __init__(self, metadata: pandas.DataFrame, years: Sequence[int], values: numpy.ndarray):
+		self.metadata: pandas.DataFrame = metadata[SERIES_METADATA].reset_index(drop = True)
+		self.years: numpy.ndarray = numpy.asarray(years, dtype = int)
+		self.values: numpy.ndarray = numpy.ascontiguousarray(values, dtype = numpy.float64)
+
+		expected_shape = (len(self.metadata), len(self.years))
+		if self.values.shape != expected_shape:
+			message = f"Expected a value array with shape {expected_shape}, got {self.values.shape}"
+			raise ValueError(message)
+
+	def __len__(self) -> int:
+		return len(self.metadata)
+
+	def __iter__(self) -> Iterator[StandardSeriesView]:
+		for metadata, values in zip(self.metadata.itertuples(index = False, name = None), self.values):
+			yield StandardSeriesView(metadata, self.years, values)
+
+	def __getitem__(self, index: int) -> StandardSeriesView:
+		metadata = tuple(self.metadata.iloc[index].tolist())
+		return StandardSeriesView(metadata, self.years, self.values[index])
+
+	@classmethod
+	def from_series(cls, series: Iterable[StandardSeries]) -> 'StandardTable':
+		""" Builds a table from a list of series. Timepoints missing from a series are filled with NaN."""
+		series = list(series)
+		years = sorted({year for item in series for year, _ in item.values})
+		columns = {year: index for index, year in enumerate(years)}
+
+		values = numpy.full((len(series), len(years)), numpy.nan)
+		for row, item in enumerate(series):
+			for year, value in item.values:
+				values[row, columns[year]] = value
+
+		metadata = pandas.DataFrame([[getattr(item, name) for name in SERIES_METADATA] for item in series],
+			columns = SERIES_METADATA)
+		return cls(metadata, years, values)
+
+	def to_series(self, dropna: bool = False) -> List[StandardSeries]:
+		"""
+			Converts the table into a list of `StandardSeries`.
+		Parameters
+		----------
+		dropna: bool; default False
+			Whether to skip missing values in each series.
+		"""
+		years = self.years.tolist()
+		result = list()
+		for metadata, values in zip(self.metadata.itertuples(index = False, name = None), self.values.tolist()):
+			series_values = list(zip(years, values))
+			if dropna:
+				series_values = [i for i in series_values if i[1] == i[1]]
+			result.append(StandardSeries(*metadata, values = series_values))
+		return result
+
+	def to_frame(self) -> pandas.DataFrame:
+		""" Returns a wide table with the series metadata followed by one column per timepoint."""
+		values = pandas.DataFrame(self.values, columns = self.years.tolist())
+		return pandas.concat([self.metadata, values], axis = 1)
+
+
 @dataclass
 class StandardData:
 	report: StandardReport
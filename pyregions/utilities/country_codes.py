@@ -1,11 +1,20 @@
 from pathlib import Path
 import csv
+import os
+import pickle
 from dataclasses import dataclass, asdict
-from typing import Dict, Optional
-from fuzzywuzzy import process
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import pandas
+from pyregions.geotools.code_classifier import get_classifier
 from pyregions.utilities import load_table, save_table
+from pyregions.utilities.table_utilities import _get_delimiter
+from pyregions.utilities.fuzzy_index import FuzzyIndex
 
 COUNTRY_CODE_FILENAME = Path(__file__).parent / "data" / "country-codes.csv"
+# Set to `None` to always parse the csv file.
+CACHE_FILENAME: Optional[Path] = COUNTRY_CODE_FILENAME.with_suffix('.pickle')
+NAMESPACES = ['name', 'iso2', 'iso3', 'm49', 'ison']
 
 
 @dataclass
@@ -20,8 +29,64 @@ def _get_separator():
 	return None
 
 
+def _check_column(table: pandas.DataFrame, column: str):
+	if column not in table.columns:
+		message = "'{}' is not a valid column. Expected one of {}".format(column, list(table.columns))
+		raise ValueError(message)
+
+
+def _parse_codes(values: pandas.Series) -> pandas.Series:
+	""" Converts a code column read as text: empty cells become missing values and numeric codes become integers."""
+	if values.dtype != object and not pandas.api.types.is_string_dtype(values):
+		return values
+	values = values.astype(object).where(values != '', None)
+	numeric = values.str.fullmatch(r'[0-9]+').fillna(False).astype(bool)
+	values[numeric] = values[numeric].astype(int)
+	return values
+
+
+def _convert_codes(values: pandas.Series, namespace: Optional[str], fuzzy: int, cache: Dict[Any, Optional[str]]) -> pandas.Series:
+	"""
+		Converts a column of region labels to iso-3 codes.
+	Parameters
+	----------
+	values: pandas.Series
+	namespace: Optional[str]
+	fuzzy: int
+	cache: Dict[Any, Optional[str]]
+		Previously converted labels. Updated with any new labels in `values`.
+	"""
+	# Country columns only have a few hundred distinct values, so each one is only searched for once.
+	old_values = [i for i in pandas.unique(values.values) if i not in cache]
+
+	if fuzzy:
+		new_values = [fuzzy_search(i,fuzzy) for i in old_values]
+	elif namespace:
+		new_values = [get_codes(i, namespace) for i in old_values]
+	else:
+		# Look each code up in the namespace it most likely belongs to before searching every namespace.
+		lookups = get_classifier().classify(pandas.Series(old_values, dtype = object))['lookup']
+		new_values = [_get_classified_codes(i, lookup) for i, lookup in zip(old_values, lookups)]
+
+	new_values = [(v['iso3'] if v else v) for v in new_values]
+	cache.update(zip(old_values, new_values))
+
+	return values.map(cache)
+
+
+def _get_classified_codes(key: Any, namespace: Optional[str]) -> Optional[Dict[str, Any]]:
+	""" Checks the namespace chosen by the code classifier first, then every namespace."""
+	result = None
+	if namespace in NAMESPACES:
+		code = int(key) if namespace == 'ison' else str(key).strip().upper()
+		result = get_codes(code, namespace)
+	if result is None:
+		result = get_codes(key)
+	return result
+
+
 def convert_table_codes(input_filename: Path, output_filename: Path = None, column: str = 'countryCode',
-		namespace: Optional[str] = None, fuzzy:int = 0) -> Path:
+		namespace: Optional[str] = None, fuzzy:int = 0, chunksize: Optional[int] = None) -> Path:
 	"""
 	Adds a 'regionCode' column to the given table containing iso-3 country codes.
 	Parameters
@@ -32,37 +97,59 @@ def convert_table_codes(input_filename: Path, output_filename: Path = None, colu
 	namespace: {'iso2', 'iso3', 'm49'}; default None
 	fuzzy: int; default 0
 		The score to use when fuzzy matching when above 0. If 0, the regular code search is used instead.
+	chunksize: Optional[int]; default None
+		If given, the table is read and written `chunksize` rows at a time rather than loaded into memory at once.
+		Only csv/tsv tables can be converted this way.
 	Returns
 	-------
 	path: Path
 		Location of the output table.
 	"""
+	if output_filename is None:
+		output_filename = input_filename.with_suffix('.edited.tsv')
+	elif output_filename.is_dir():
+		output_filename = output_filename / input_filename.name
 
-	table = load_table(input_filename)
+	if chunksize:
+		return _convert_table_codes_chunked(input_filename, output_filename, column, namespace, fuzzy, chunksize)
 
-	if column not in table.columns:
-		message = "'{}' is not a valid column. Expected one of {}".format(column, list(table.columns))
-		raise ValueError(message)
+	separator = _get_delimiter(input_filename)
+	if separator:
+		table = pandas.read_csv(input_filename, sep = separator, dtype = str, keep_default_na = False)
+	else:
+		table = load_table(input_filename)
+	_check_column(table, column)
 
-	old_values = table[column].values
+	table['regionCode'] = _convert_codes(_parse_codes(table[column]), namespace, fuzzy, dict())
 
-	if fuzzy:
-		new_values = [fuzzy_search(i,fuzzy) for i in old_values]
-	else:
+	opath = save_table(table, output_filename)
+	return opath
 
-		new_values = [get_codes(i, namespace) for i in old_values]
 
-	new_values = [(v['iso3'] if v else v) for v in new_values]
+def _convert_table_codes_chunked(input_filename: Path, output_filename: Path, column: str, namespace: Optional[str],
+		fuzzy: int, chunksize: int) -> Path:
+	""" Streams a delimited table through `convert_table_codes` so that memory use does not depend on the table size."""
+	input_separator = _get_delimiter(input_filename)
+	output_separator = _get_delimiter(output_filename)
+	if input_separator is None or output_separator is None:
+		message = f"Only csv/tsv tables can be converted in chunks: '{input_filename}' -> '{output_filename}'"
+		raise ValueError(message)
 
-	table['regionCode'] =  new_values
+	# Shared between chunks so that each label is only searched for once.
+	cache = dict()
+	with output_filename.open('w', newline = '') as output_file:
+		# Every column is read as text so that the other columns are written back unchanged. Otherwise pandas infers
+		# the column types separately for each chunk.
+		chunks = pandas.read_csv(input_filename, sep = input_separator, chunksize = chunksize, dtype = str,
+			keep_default_na = False)
+		for index, chunk in enumerate(chunks):
+			if index == 0:
+				_check_column(chunk, column)
+			chunk['regionCode'] = _convert_codes(_parse_codes(chunk[column]), namespace, fuzzy, cache)
+			chunk.to_csv(output_file, sep = output_separator, index = False, header = index == 0)
 
-	if output_filename is None:
-		output_filename = input_filename.with_suffix('.edited.tsv')
-	elif output_filename.is_dir():
-		output_filename = output_filename / input_filename.name
+	return output_filename
 
-	opath = save_table(table, output_filename)
-	return opath
 
 def fuzzy_search(key: str, score = 95) -> Dict[str, str]:
 	"""
@@ -79,13 +166,78 @@ def fuzzy_search(key: str, score = 95) -> Dict[str, str]:
 	str
 	the country code.
 	"""
-	best_match, ratio = process.extractOne(key, COUNTRY_CODES.keys())
+	result = get_fuzzy_index().extract_one(key, score)
+
+	if result:
+		return get_country_codes()[result[0]]
+
+
+def get_fuzzy_index() -> FuzzyIndex:
+	""" Returns the fuzzy index over the country names, building it the first time it is needed."""
+	global _FUZZY_INDEX
+	if _FUZZY_INDEX is None:
+		_FUZZY_INDEX = FuzzyIndex(get_country_codes().keys())
+	return _FUZZY_INDEX
+
+
+class CountryCodeIndex:
+	"""
+		Reverse lookup tables for the country code table. Built once so that a code can be found without scanning
+		every country.
+	Parameters
+	----------
+	codes: Dict[str, Dict[str, str]]
+		The table returned by `load_country_codes`.
+	"""
+
+	def __init__(self, codes: Dict[str, Dict[str, Any]]):
+		# Maps each namespace to a dict of the codes in that namespace and the name of the matching country.
+		self.namespaces: Dict[str, Dict[Any, str]] = {namespace: dict() for namespace in NAMESPACES}
+		# Maps each code to every (namespace, country name) pair it appears in, in the same order as the code table.
+		self.combined: Dict[Any, List[Tuple[str, str]]] = dict()
+
+		for name, country in codes.items():
+			for namespace, value in country.items():
+				if value is None or value == '': continue
+				self.namespaces[namespace].setdefault(value, name)
+				self.combined.setdefault(value, list()).append((namespace, name))
+
+	def find(self, key: Any, namespace: Optional[str] = None) -> Optional[str]:
+		""" Returns the name of the first country matching `key`."""
+		if namespace:
+			return self.namespaces[namespace].get(key)
+		matches = self.combined.get(key)
+		return matches[0][1] if matches else None
+
+	def is_ambiguous(self, key: Any) -> bool:
+		""" Checks whether `key` refers to more than one country when no namespace is given."""
+		matches = self.combined.get(key, [])
+		return len({name for _, name in matches}) > 1
+
+	def ambiguous_keys(self) -> Dict[Any, List[Tuple[str, str]]]:
+		""" Returns every key that refers to more than one country along with the namespaces it was found in."""
+		return {key: matches for key, matches in self.combined.items() if self.is_ambiguous(key)}
+
+
+def find_codes(key: Any) -> List[Tuple[str, Dict[str, Any]]]:
+	"""
+	Retrieves every country matching the given key in any namespace.
+	Parameters
+	----------
+	key: Any
+		The string (or numeric code) to search for.
 
-	if best_match and ratio >= score:
-		return COUNTRY_CODES[best_match]
+	Returns
+	-------
+	List[Tuple[str, Dict[str,Any]]]
+		The namespace the key was found in and the matching country.
+	"""
+	codes = get_country_codes()
+	return [(namespace, codes[name]) for namespace, name in get_country_index().combined.get(key, [])]
 
 
-def get_codes(key: str, namespace: str = None) -> Optional[Dict[str, str]]:
+@lru_cache(maxsize = 4096)
+def get_codes(key: Any, namespace: str = None, strict: bool = False) -> Optional[Dict[str, Any]]:
 	"""
 	Retrieves a code based on the given key. Searches for the first matching key in any field if namespace is not
 	given.
@@ -93,7 +245,9 @@ def get_codes(key: str, namespace: str = None) -> Optional[Dict[str, str]]:
 	----------
 	key: str
 		The string to search for.
-	namespace: {'iso2', 'iso3', 'ison', 'm49'}; default None
+	namespace: {'name', 'iso2', 'iso3', 'ison', 'm49'}; default None
+	strict: bool; default False
+		If `True` and no namespace is given, raises a ValueError when the key matches more than one country.
 
 	Returns
 	-------
@@ -102,16 +256,63 @@ def get_codes(key: str, namespace: str = None) -> Optional[Dict[str, str]]:
 
 	if namespace: namespace = namespace.lower()
 
-	for country in COUNTRY_CODES.values():
-		if namespace:
-			if key == country[namespace]:
-				return country
-		else:
-			if key in country.values():
-				return country
+	index = get_country_index()
+	if strict and not namespace and index.is_ambiguous(key):
+		message = f"'{key}' refers to more than one country: {index.combined[key]}. Specify a namespace."
+		raise ValueError(message)
+
+	name = index.find(key, namespace)
+	if name is not None:
+		return get_country_codes()[name]
+
 
+def _get_source_key(filename: Path) -> Tuple[int, int]:
+	""" Identifies the version of a source file so that stale caches can be detected."""
+	stat = filename.stat()
+	return stat.st_mtime_ns, stat.st_size
+
+
+def _read_cache(filename: Path, cache_filename: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+	""" Returns the cached code table, or `None` if the cache is missing or older than `filename`."""
+	try:
+		with cache_filename.open('rb') as cache_file:
+			source_key, codes = pickle.load(cache_file)
+	except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+		return None
+
+	if source_key != _get_source_key(filename):
+		return None
+	return codes
+
+
+def _write_cache(filename: Path, cache_filename: Path, codes: Dict[str, Dict[str, Any]]):
+	# Write to a temporary file first so that a concurrent reader never sees a partial cache.
+	temporary_filename = cache_filename.with_suffix(f'.{os.getpid()}.tmp')
+	try:
+		with temporary_filename.open('wb') as cache_file:
+			pickle.dump((_get_source_key(filename), codes), cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+		os.replace(str(temporary_filename), str(cache_filename))
+	except OSError:
+		# The data folder may be read-only. The cache is only an optimization.
+		if temporary_filename.exists():
+			temporary_filename.unlink()
+
+
+def load_country_codes(filename: Path = COUNTRY_CODE_FILENAME,
+		cache_filename: Optional[Path] = None) -> Dict[str, Dict[str, str]]:
+	"""
+		Parses the country code table.
+	Parameters
+	----------
+	filename: Path
+	cache_filename: Optional[Path]
+		If given, the parsed table is pickled to this file and reused until `filename` is modified.
+	"""
+	if cache_filename:
+		codes = _read_cache(filename, cache_filename)
+		if codes is not None:
+			return codes
 
-def load_country_codes(filename: Path = COUNTRY_CODE_FILENAME) -> Dict[str, Dict[str, str]]:
 	codes = dict()
 	with filename.open('r') as code_file:
 		reader = csv.DictReader(code_file, delimiter = '\t')
@@ -128,10 +329,53 @@ def load_country_codes(filename: Path = COUNTRY_CODE_FILENAME) -> Dict[str, Dict
 				ison = None
 
 			codes[name] = asdict(CountryCode(name, iso2, iso3, m49, ison))  # Use a dict so fuzzy search is easier.
+
+	if cache_filename:
+		_write_cache(filename, cache_filename, codes)
 	return codes
 
 
-COUNTRY_CODES = load_country_codes()
+def get_country_codes() -> Dict[str, Dict[str, Any]]:
+	""" Returns the country code table, loading it the first time it is needed."""
+	global _COUNTRY_CODES
+	if _COUNTRY_CODES is None:
+		_COUNTRY_CODES = load_country_codes(COUNTRY_CODE_FILENAME, CACHE_FILENAME)
+	return _COUNTRY_CODES
+
+
+def get_country_index() -> CountryCodeIndex:
+	""" Returns the lookup tables for the country code table."""
+	global _COUNTRY_INDEX
+	if _COUNTRY_INDEX is None:
+		_COUNTRY_INDEX = CountryCodeIndex(get_country_codes())
+	return _COUNTRY_INDEX
+
+
+def set_country_codes(codes: Dict[str, Dict[str, Any]], index: Optional[CountryCodeIndex] = None):
+	"""
+		Replaces the loaded country code table. Used to hand a prebuilt table to worker processes so that they do not
+		need to parse the csv file themselves.
+	"""
+	global _COUNTRY_CODES, _COUNTRY_INDEX, _FUZZY_INDEX
+	_COUNTRY_CODES = codes
+	_COUNTRY_INDEX = index if index is not None else CountryCodeIndex(codes)
+	_FUZZY_INDEX = None
+	get_codes.cache_clear()
+
+
+def __getattr__(name: str):
+	# `COUNTRY_CODES` and `COUNTRY_INDEX` used to be built at import time. They are now loaded on first access.
+	if name == 'COUNTRY_CODES':
+		return get_country_codes()
+	if name == 'COUNTRY_INDEX':
+		return get_country_index()
+	raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+_COUNTRY_CODES: Optional[Dict[str, Dict[str, Any]]] = None
+_COUNTRY_INDEX: Optional[CountryCodeIndex] = None
+_FUZZY_INDEX: Optional[FuzzyIndex] = None
+
 if __name__ == "__main__":
 	tests = ['US', 'Australia']
 
@@ -0,0 +1,114 @@
+"""
+	A character n-gram index used to shortlist candidates for fuzzy string matching. Only the shortlisted candidates are
+	scored with `fuzzywuzzy`, so a search does not need to compare the query against every label.
+"""
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from fuzzywuzzy import fuzz, utils
+
+SearchResult = Tuple[str, int, Any]
+
+
+def get_ngrams(string: str, n: int = 3) -> Set[str]:
+	""" Returns the set of character n-grams in `string`. The string is padded so that short strings still have n-grams."""
+	string = f" {string} "
+	if len(string) <= n:
+		return {string}
+	return {string[i:i + n] for i in range(len(string) - n + 1)}
+
+
+class FuzzyIndex:
+	"""
+		Precomputed n-gram index over a collection of labels.
+	Parameters
+	----------
+	choices: Union[Mapping[Any, str], Iterable[str]]
+		The labels to search. If a mapping (ex. a dict or pandas.Series) is given, searches return the key of the
+		matching label, similar to `fuzzywuzzy.process.extractOne`.
+	keys: Optional[Iterable[Any]]
+		The key of each label in `choices`. Useful when several labels share the same key.
+	n: int; default 3
+		The length of the character n-grams.
+	shortlist: int; default 10
+		The number of candidates to score exactly after the n-gram search.
+	"""
+
+	def __init__(self, choices: Union[Mapping[Any, str], Iterable[str]], keys: Optional[Iterable[Any]] = None,
+			n: int = 3, shortlist: int = 10):
+		self.n = n
+		self.shortlist = shortlist
+
+		if keys is not None:
+			items = list(zip(keys, choices))
+		elif hasattr(choices, 'items'):
+			items = list(choices.items())
+		else:
+			items = [(label, label) for label in choices]
+
+		self.labels: List[str] = list()
+		self.keys: List[Any] = list()
+		self.processed: List[str] = list()
+
+		# Maps each processed label to its position, and each n-gram to the positions of the labels containing it.
+		self.exact: Dict[str, List[int]] = dict()
+		self.ngrams: Dict[str, List[int]] = dict()
+
+		for key, label in items:
+			processed = utils.full_process(label) if isinstance(label, str) else ''
+			if not processed: continue
+			position = len(self.labels)
+			self.labels.append(label)
+			self.keys.append(key)
+			self.processed.append(processed)
+
+			self.exact.setdefault(processed, list()).append(position)
+			for gram in get_ngrams(processed, n):
+				self.ngrams.setdefault(gram, list()).append(position)
+
+	def __len__(self) -> int:
+		return len(self.labels)
+
+	def candidates(self, processed: str, limit: int) -> List[int]:
+		""" Returns the positions of the labels sharing the most n-grams with the (already processed) query."""
+		counts = Counter()
+		for gram in get_ngrams(processed, self.n):
+			counts.update(self.ngrams.get(gram, ()))
+
+		positions = [position for position, _ in counts.most_common(limit)]
+		for position in self.exact.get(processed, ()):
+			if position not in positions:
+				positions.append(position)
+		return positions
+
+	def search(self, query: str, limit: int = 1, score_cutoff: int = 0) -> List[SearchResult]:
+		"""
+			Finds the labels most similar to `query`.
+		Parameters
+		----------
+		query: str
+		limit: int; default 1
+			The maximum number of results to return.
+		score_cutoff: int; default 0
+			Only labels with a score at least this high are returned.
+
+		Returns
+		-------
+		List[Tuple[str, int, Any]]
+			The label, score and key of each match, sorted by score.
+		"""
+		processed = utils.full_process(query) if isinstance(query, str) else ''
+		if not processed:
+			return []
+
+		positions = self.candidates(processed, max(self.shortlist, limit))
+		scored = [(fuzz.WRatio(processed, self.processed[position]), position) for position in positions]
+		# Ties are resolved by the original order of the labels.
+		scored = sorted((i for i in scored if i[0] >= score_cutoff), key = lambda s: (-s[0], s[1]))
+
+		return [(self.labels[position], score, self.keys[position]) for score, position in scored[:limit]]
+
+	def extract_one(self, query: str, score_cutoff: int = 0) -> Optional[SearchResult]:
+		""" Returns the best match for `query`, or `None` if no label scores at least `score_cutoff`."""
+		results = self.search(query, 1, score_cutoff)
+		return results[0] if results else None
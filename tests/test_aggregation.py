@@ -0,0 +1,83 @@
+import math
+
+import numpy
+import pandas
+import pytest
+
+from pyregions.geotools.aggregation import RegionAggregator, aggregate_geoschemes, membership_matrix
+
+GROUPS = {
+	'North':  ['AAA', 'BBB'],
+	'South':  ['CCC', 'DDD', 'ZZZ'],
+	'Empty':  ['ZZZ']
+}
+
+
+@pytest.fixture
+def table() -> pandas.DataFrame:
+	data = {
+		2000: [1.0, 2.0, 3.0, numpy.nan],
+		2001: [4.0, numpy.nan, 6.0, 8.0]
+	}
+	return pandas.DataFrame(data, index = pandas.Index(['AAA', 'BBB', 'CCC', 'DDD'], name = 'regionCode'))
+
+
+@pytest.fixture
+def population() -> pandas.DataFrame:
+	data = {
+		2000: [1.0, 3.0, 1.0, 1.0],
+		2001: [1.0, 1.0, 1.0, 3.0]
+	}
+	return pandas.DataFrame(data, index = ['AAA', 'BBB', 'CCC', 'DDD'])
+
+
+def test_membership_matrix():
+	matrix = membership_matrix(GROUPS, ['AAA', 'CCC', 'BBB'])
+	assert matrix.tolist() == [[1, 0, 1], [0, 1, 0], [0, 0, 0]]
+
+def test_aggregate_sum(table):
+	result = RegionAggregator(GROUPS).aggregate(table)
+	assert result.index.name == 'regionCode'
+	assert result.loc['North'].tolist() == [3.0, 4.0]
+	assert result.loc['South'].tolist() == [3.0, 14.0]
+	assert result.loc['Empty'].isna().all()
+
+	strict = RegionAggregator(GROUPS).aggregate(table, skipna = False)
+	assert math.isnan(strict.loc['North', 2001])
+	assert strict.loc['North', 2000] == 3.0
+
+def test_aggregate_means(table, population):
+	aggregator = RegionAggregator(GROUPS)
+	result = aggregator.aggregate(table, how = 'mean')
+	assert result.loc['South'].tolist() == [3.0, 7.0]
+
+	result = aggregator.aggregate(table, how = 'weighted_mean', weights = population)
+	assert result.loc['North', 2000] == pytest.approx((1 * 1 + 2 * 3) / 4)
+	assert result.loc['South', 2001] == pytest.approx((6 * 1 + 8 * 3) / 4)
+	# Regions without a value do not count towards the total weight.
+	assert result.loc['North', 2001] == 4.0
+
+	result = aggregator.aggregate(table, how = 'weighted_mean', weights = population[2000])
+	assert result.loc['North', 2001] == 4.0
+
+	with pytest.raises(ValueError):
+		aggregator.aggregate(table, how = 'weighted_mean')
+	with pytest.raises(ValueError):
+		aggregator.aggregate(table, how = 'median')
+
+def test_aggregate_panel(table, population):
+	panel = pandas.concat({'GDP': table, 'POP': table * 10}, names = ['seriesCode', 'regionCode'])
+	panel = panel.swaplevel().sort_index()
+
+	result = RegionAggregator(GROUPS).aggregate(panel, how = 'weighted_mean', weights = population, level = 'regionCode')
+	assert result.index.names == ['regionCode', 'seriesCode']
+	expected = RegionAggregator(GROUPS).aggregate(table, how = 'weighted_mean', weights = population)
+	assert result.loc[('South', 'GDP')].tolist() == expected.loc['South'].tolist()
+	assert result.loc[('South', 'POP')].tolist() == pytest.approx((expected.loc['South'] * 10).tolist())
+
+def test_aggregate_geoschemes():
+	table = pandas.DataFrame({2000: [1.0, 2.0, 3.0]}, index = ['USA', 'CAN', 'MEX'])
+	result = aggregate_geoschemes(table)
+	assert result.loc['Northern America', 2000] == 3.0
+	assert result.loc['Central America', 2000] == 3.0
+	assert math.isnan(result.loc['Oceania', 2000])
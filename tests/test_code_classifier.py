@@ -0,0 +1,61 @@
+import pandas
+import pytest
+
+from pyregions.geotools.code_classifier import CodeClassifier, compile_pattern
+
+
+@pytest.fixture
+def classifier() -> CodeClassifier:
+	return CodeClassifier()
+
+
+def test_compile_pattern_renames_groups():
+	pattern, subtypes = compile_pattern("(?P<nuts-1>[A-Z]{2}[0-9A-N])|(?P<nuts-2>[A-Z]{2}[0-9A-N]{2})")
+	assert pattern == "(?P<nuts_1>[A-Z]{2}[0-9A-N])|(?P<nuts_2>[A-Z]{2}[0-9A-N]{2})"
+	assert subtypes == {'nuts_1': 'nuts-1', 'nuts_2': 'nuts-2'}
+
+def test_compile_pattern_nests_consecutive_groups():
+	pattern, _ = compile_pattern(r"(?P<state>[\d]{2})(?P<county>[\d]{3})")
+	assert pattern == r"(?P<state>[\d]{2})(?:(?P<county>[\d]{3}))?"
+
+def test_compile_pattern_rejects_unbalanced_patterns():
+	with pytest.raises(ValueError):
+		compile_pattern("(?P<iso3>[A-Z]{3}")
+
+
+@pytest.mark.parametrize(
+	"code,namespace,subtype",
+	[
+		('USA', 'ISO', 'iso3'),
+		('gb', 'ISO', 'iso2'),
+		('004', 'ISO', 'numeric'),
+		('DE1', 'NUTS', 'nuts-1'),
+		('DE11', 'NUTS', 'nuts-2'),
+		('UKC11', 'NUTS', 'nuts-3'),
+		('36', 'FIPS', 'state'),
+		('36061', 'FIPS', 'county')
+	]
+)
+def test_classify(classifier, code, namespace, subtype):
+	result = classifier.classify(pandas.Series([code]))
+	assert result.loc[0, 'namespace'] == namespace
+	assert result.loc[0, 'subType'] == subtype
+
+def test_classify_unknown_values(classifier):
+	result = classifier.classify(pandas.Series(['XX11', None, 'United States'], index = [5, 6, 7]))
+	assert result.index.tolist() == [5, 6, 7]
+	assert result['namespace'].isna().all()
+
+def test_classify_prefers_the_best_namespace_for_the_column(classifier):
+	# `FRB` is both a valid iso-3 code and a valid NUTS-1 code.
+	nuts = classifier.classify(pandas.Series(['FRB', 'DE11', 'FR10']))
+	assert nuts['namespace'].tolist() == ['NUTS'] * 3
+	assert nuts['lookup'].tolist() == ['nuts'] * 3
+
+	iso = classifier.classify(pandas.Series(['FRB', 'USA', 'GB']))
+	assert iso['namespace'].tolist() == ['ISO'] * 3
+	assert iso['lookup'].tolist() == ['iso3', 'iso3', 'iso2']
+
+def test_infer_namespace(classifier):
+	assert classifier.infer_namespace(['DE11', 'FR10', 'USA']) == 'NUTS'
+	assert classifier.infer_namespace(['Atlantis']) is None
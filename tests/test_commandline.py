@@ -0,0 +1,94 @@
+import pandas
+import pytest
+
+import commandline
+from pyregions.utilities import country_codes
+
+CODES = {
+	'Testland':  {'name': 'Testland', 'iso2': 'TL', 'iso3': 'TST', 'm49': '901', 'ison': 901},
+	'Otherland': {'name': 'Otherland', 'iso2': 'OL', 'iso3': 'OTH', 'm49': '902', 'ison': 902}
+}
+
+
+@pytest.fixture
+def test_codes(monkeypatch):
+	""" Replaces the country code table, restoring the original afterwards."""
+	for name in ['_COUNTRY_CODES', '_COUNTRY_INDEX', '_FUZZY_INDEX']:
+		monkeypatch.setattr(country_codes, name, getattr(country_codes, name))
+	country_codes.set_country_codes(CODES)
+	yield CODES
+	country_codes.get_codes.cache_clear()
+
+
+def _write_table(filename, codes):
+	rows = ["countryCode\tvalue"] + [f"{code}\t{index}" for index, code in enumerate(codes)]
+	filename.write_text("\n".join(rows) + "\n")
+	return filename
+
+
+def _get_parser(*args) -> commandline.FormatParser:
+	return commandline.FormatParser.from_parser(commandline.define_parser().parse_args(['format', *args]))
+
+
+def test_expand_input_paths_with_a_directory(tmp_path):
+	_write_table(tmp_path / "a.tsv", ['TL'])
+	_write_table(tmp_path / "b.csv", ['TL'])
+	_write_table(tmp_path / "a.edited.tsv", ['TL'])
+	(tmp_path / "notes.txt").write_text("")
+
+	assert commandline.expand_input_paths(str(tmp_path)) == [tmp_path / "a.tsv", tmp_path / "b.csv"]
+
+
+def test_expand_input_paths_with_a_glob(tmp_path):
+	(tmp_path / "nested").mkdir()
+	_write_table(tmp_path / "a.tsv", ['TL'])
+	_write_table(tmp_path / "nested" / "b.tsv", ['TL'])
+	_write_table(tmp_path / "nested" / "b.edited.tsv", ['TL'])
+
+	assert commandline.expand_input_paths(str(tmp_path / "**" / "*.tsv")) == [
+		tmp_path / "a.tsv", tmp_path / "nested" / "b.tsv"
+	]
+	assert commandline.expand_input_paths(str(tmp_path / "nothing*" / "*.csv")) == []
+
+
+def test_format_tables_in_parallel(tmp_path, test_codes):
+	inputs = [_write_table(tmp_path / f"table{index}.tsv", ['TL', 'OL', 'XX']) for index in range(3)]
+	output = tmp_path / "output"
+	parser = _get_parser('--input', str(tmp_path / "*.tsv"), '--output', str(output), '--jobs', '2')
+
+	results = commandline.format_tables(parser)
+
+	assert [filename for filename, *_ in results] == inputs
+	assert all(error is None for *_, error in results)
+	for filename in inputs:
+		# The workers only know the test codes if they were handed over by the pool initializer.
+		table = pandas.read_csv(output / filename.name, sep = '\t', keep_default_na = False)
+		assert table['regionCode'].tolist() == ['TST', 'OTH', '']
+
+
+def test_failed_tables_are_reported(tmp_path, test_codes, capsys):
+	good = _write_table(tmp_path / "good.tsv", ['TL'])
+	bad = tmp_path / "bad.tsv"
+	bad.write_text("country\tvalue\nTL\t1\n")
+	args = commandline.define_parser().parse_args(['format', '--input', str(good), str(bad)])
+
+	with pytest.raises(SystemExit) as exception:
+		commandline.utility_workflow(args)
+	assert exception.value.code not in (0, None)
+	assert str(bad) in str(exception.value.code)
+
+	output = capsys.readouterr().out
+	assert f"{bad}" in output and "FAILED (ValueError" in output
+	assert "Converted 1 of 2 tables" in output
+	assert (tmp_path / "good.edited.tsv").exists()
+
+
+def test_format_command_without_matching_tables(tmp_path):
+	args = commandline.define_parser().parse_args(['format', '--input', str(tmp_path / "nothing*" / "*.csv")])
+	with pytest.raises(SystemExit, match = "No input tables matched"):
+		commandline.utility_workflow(args)
+
+
+def test_print_summary_without_results(capsys):
+	commandline.print_summary([])
+	assert "Converted 0 of 0 tables" in capsys.readouterr().out
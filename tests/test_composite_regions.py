@@ -0,0 +1,82 @@
+import math
+
+import numpy
+import pandas
+import pytest
+
+from pyregions.geotools.composite_regions import CompositeRegions, parse_member
+
+
+@pytest.fixture
+def composites() -> CompositeRegions:
+	return CompositeRegions()
+
+
+@pytest.fixture
+def table() -> pandas.DataFrame:
+	years = [1950, 1958, 1972, 1973, 2019]
+	codes = ["BEL", "FRA", "ITA", "LUX", "NLD", "DEU", "DNK", "IRL", "GBR"]
+	values = numpy.arange(len(codes) * len(years), dtype = float).reshape(len(codes), len(years))
+	return pandas.DataFrame(values, index = codes, columns = years)
+
+
+def test_parse_member():
+	member = parse_member("PL2&PL4|PL21&PL22&PL41")
+	assert member.alternatives == (("PL2", "PL4"), ("PL21", "PL22", "PL41"))
+	assert member.resolve() == ("PL2", "PL4")
+	assert member.resolve({"PL21", "PL22", "PL41"}) == ("PL21", "PL22", "PL41")
+	assert member.resolve({"PL2"}) is None
+
+	assert parse_member("RUS-KGD").alternatives == (("RUS-KGD",),)
+	with pytest.raises(ValueError):
+		parse_member("PL2&")
+
+
+@pytest.mark.parametrize(
+	"year,expected",
+	[
+		(1957, 0),
+		(1958, 6),
+		(1972, 6),
+		(1973, 9),
+		(2018, 28),
+		(2019, 27),
+		(2050, 27)
+	]
+)
+def test_members(composites, year, expected):
+	assert len(composites.members("EU", year)) == expected
+
+def test_members_by_name(composites):
+	assert composites.members("European Union", 1973) == composites.members("EU", 1973)
+	assert "GBR" not in composites.members("EU", 2019)
+	with pytest.raises(ValueError):
+		composites.members("XXX", 2000)
+
+def test_components(composites):
+	assert "PL2" in composites.components("DEU", 1900)
+	assert "RUS-KGD" in composites.components("DEU", 1900)
+	components = composites.components("DEU", 1900, available = ["DEU", "DK032", "PL21", "PL22"])
+	assert components == ["DEU", "DK032"]
+
+def test_aggregate(composites, table):
+	result = composites.aggregate(table, ["EU"])
+	assert list(result.columns) == list(table.columns)
+	assert math.isnan(result.loc["EU", 1950])
+
+	for year in [1958, 1972, 1973]:
+		expected = table.loc[composites.members("EU", year), year].sum()
+		assert result.loc["EU", year] == expected
+
+	# Greece and most of the later members are not in the table.
+	assert math.isnan(result.loc["EU", 2019])
+
+def test_aggregate_skipna(composites, table):
+	table.loc["FRA", 1958] = numpy.nan
+	strict = composites.aggregate(table, ["EU"])
+	assert math.isnan(strict.loc["EU", 1958])
+
+	result = composites.aggregate(table, ["EU", "GBR"], skipna = True)
+	assert result.loc["EU", 1958] == table.loc[composites.members("EU", 1958), 1958].sum()
+	assert result.loc["EU", 2019] == table.loc[["BEL", "FRA", "ITA", "LUX", "NLD", "DEU", "DNK", "IRL"], 2019].sum()
+	assert result.loc["GBR", 1950] == table.loc["GBR", 1950] + table.loc["IRL", 1950]
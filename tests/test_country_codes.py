@@ -0,0 +1,119 @@
+from pyregions.utilities import country_codes
+import pandas
+import pytest
+
+
+@pytest.fixture
+def index() -> country_codes.CountryCodeIndex:
+	codes = {
+		'Alpha': {'name': 'Alpha', 'iso2': 'AL', 'iso3': 'ALP', 'm49': '001', 'ison': 1},
+		'Beta':  {'name': 'Beta', 'iso2': 'BE', 'iso3': 'AL', 'm49': '002', 'ison': 2},
+		'Gamma': {'name': 'Gamma', 'iso2': '', 'iso3': 'GAM', 'm49': '', 'ison': None}
+	}
+	return country_codes.CountryCodeIndex(codes)
+
+
+@pytest.mark.parametrize(
+	"key,namespace,expected",
+	[
+		('US', None, 'USA'),
+		('USA', None, 'USA'),
+		('840', 'm49', 'USA'),
+		(840, 'ison', 'USA'),
+		('FR', 'iso2', 'FRA'),
+		('FR', 'ISO3', None),
+		('not a code', None, None)
+	]
+)
+def test_get_codes(key, namespace, expected):
+	result = country_codes.get_codes(key, namespace)
+	if expected is None:
+		assert result is None
+	else:
+		assert result['iso3'] == expected
+
+
+def test_index_keeps_the_first_match(index):
+	assert index.find('AL') == 'Alpha'
+	assert index.find('AL', 'iso3') == 'Beta'
+	assert index.find('GAM', 'iso3') == 'Gamma'
+
+
+def test_index_ignores_missing_codes(index):
+	assert index.find('') is None
+	assert index.find(None) is None
+
+
+def test_index_reports_ambiguous_keys(index):
+	assert index.is_ambiguous('AL')
+	assert not index.is_ambiguous('BE')
+	assert index.ambiguous_keys() == {'AL': [('iso2', 'Alpha'), ('iso3', 'Beta')]}
+
+
+def test_find_codes():
+	matches = country_codes.find_codes('USA')
+	assert [namespace for namespace, _ in matches] == ['iso3']
+	assert matches[0][1]['iso2'] == 'US'
+
+
+def test_country_codes_are_loaded_lazily():
+	assert 'US' in country_codes.COUNTRY_CODES
+	assert country_codes.COUNTRY_CODES is country_codes.get_country_codes()
+	assert country_codes.COUNTRY_INDEX is country_codes.get_country_index()
+
+	with pytest.raises(AttributeError):
+		country_codes.NOT_AN_ATTRIBUTE
+
+
+def test_load_country_codes_uses_cache(tmp_path):
+	source = tmp_path / "codes.csv"
+	source.write_text(country_codes.COUNTRY_CODE_FILENAME.read_text())
+	cache = tmp_path / "codes.pickle"
+
+	expected = country_codes.load_country_codes(source, cache)
+	assert cache.exists()
+	assert country_codes.load_country_codes(source, cache) == expected
+
+	# A cache that belongs to an older version of the source file should be ignored.
+	source.write_text("name\tISO3166-1-Alpha-2\tISO3166-1-Alpha-3\tM49\nTest\tTE\tTES\t999\n")
+	assert list(country_codes.load_country_codes(source, cache).keys()) == ['Test']
+
+
+def test_convert_table_codes_in_chunks(tmp_path):
+	source = tmp_path / "table.tsv"
+	rows = ["countryCode\tvalue"] + [f"{code}\t{index}" for index, code in enumerate(['US', 'FR', 'XX', 'US', 'DE'] * 5)]
+	source.write_text("\n".join(rows) + "\n")
+
+	expected = country_codes.convert_table_codes(source, tmp_path / "full.tsv")
+	result = country_codes.convert_table_codes(source, tmp_path / "chunked.tsv", chunksize = 4)
+
+	assert result.read_text() == expected.read_text()
+	assert result.read_text().splitlines()[1] == "US\t0\tUSA"
+
+
+def test_convert_table_codes_in_chunks_requires_a_delimited_table(tmp_path):
+	source = tmp_path / "table.tsv"
+	source.write_text("countryCode\tvalue\nUS\t1\n")
+	with pytest.raises(ValueError):
+		country_codes.convert_table_codes(source, tmp_path / "table.xlsx", chunksize = 4)
+
+
+def test_convert_table_codes_with_mixed_namespaces(tmp_path):
+	source = tmp_path / "table.tsv"
+	source.write_text("countryCode\tvalue\nUS\t1\nfra\t2\n276\t3\nXX\t4\n")
+
+	result = country_codes.convert_table_codes(source, tmp_path / "result.tsv")
+	table = pandas.read_csv(result, sep = '\t', keep_default_na = False)
+	assert table['regionCode'].tolist() == ['USA', 'FRA', 'DEU', '']
+
+
+def test_convert_table_codes_in_chunks_keeps_other_columns_unchanged(tmp_path):
+	source = tmp_path / "table.csv"
+	source.write_text("countryCode,value\nUS,1\nFR,\nDE,3\n4,4\n")
+
+	expected = country_codes.convert_table_codes(source, tmp_path / "full.csv")
+	result = country_codes.convert_table_codes(source, tmp_path / "chunked.csv", chunksize = 2)
+
+	assert result.read_text() == expected.read_text()
+	lines = result.read_text().splitlines()
+	assert lines[1:] == ["US,1,USA", "FR,,FRA", "DE,3,DEU", "4,4,AFG"]
@@ -0,0 +1,67 @@
+import pytest
+
+from pyregions.database.entity_cache import EntityCache
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self) -> float:
+		return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+	return FakeClock()
+
+
+def test_cache_counts_hits_and_misses(clock):
+	cache = EntityCache(clock = clock)
+	assert cache.get('region', 'USA') == (False, None)
+	cache.set('region', 'USA', 'united states')
+	assert cache.get('region', 'USA') == (True, 'united states')
+	assert cache.info() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 4096}
+
+def test_cache_can_store_missing_values(clock):
+	cache = EntityCache(clock = clock)
+	cache.set('region', 'XXX', None)
+	assert cache.get('region', 'XXX') == (True, None)
+
+def test_cache_removes_least_recently_used_entry(clock):
+	cache = EntityCache(maxsize = 2, clock = clock)
+	cache.set('region', 'A', 1)
+	cache.set('region', 'B', 2)
+	cache.get('region', 'A')
+	cache.set('region', 'C', 3)
+	assert cache.get('region', 'B') == (False, None)
+	assert cache.get('region', 'A') == (True, 1)
+	assert len(cache) == 2
+
+def test_cache_entries_expire_per_kind(clock):
+	cache = EntityCache(ttl = {'series': 10}, clock = clock)
+	cache.set('series', 'A', 1)
+	cache.set('region', 'A', 1)
+	clock.now = 11
+	assert cache.get('series', 'A') == (False, None)
+	assert cache.get('region', 'A') == (True, 1)
+
+def test_cache_invalidate(clock):
+	cache = EntityCache(clock = clock)
+	cache.set('series', 'A', 1)
+	cache.set('region', 'A', 1)
+	cache.invalidate('series')
+	assert cache.get('series', 'A') == (False, None)
+	assert cache.get('region', 'A') == (True, 1)
+	cache.invalidate()
+	assert len(cache) == 0
+
+def test_cache_drops_invalid_entries(clock):
+	cache = EntityCache(clock = clock)
+	cache.set('region', 'A', 1)
+	assert cache.get('region', 'A', lambda value: False) == (False, None)
+	assert len(cache) == 0
+
+def test_cache_requires_positive_size():
+	with pytest.raises(ValueError):
+		EntityCache(maxsize = 0)
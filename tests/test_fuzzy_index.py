@@ -0,0 +1,49 @@
+from pyregions.utilities.fuzzy_index import FuzzyIndex, get_ngrams
+import pytest
+
+
+@pytest.fixture
+def index() -> FuzzyIndex:
+	choices = {
+		'GBR': 'United Kingdom of Great Britain and Northern Ireland',
+		'USA': 'United States of America',
+		'FRA': 'France',
+		'DEU': 'Germany'
+	}
+	return FuzzyIndex(choices)
+
+
+def test_get_ngrams():
+	assert get_ngrams('abc') == {' ab', 'abc', 'bc '}
+	assert get_ngrams('a') == {' a '}
+
+
+@pytest.mark.parametrize(
+	"query,expected",
+	[
+		('france', 'FRA'),
+		('Germny', 'DEU'),
+		('United Kindom o Great Britain and Northern Ireland', 'GBR'),
+		('united states of america', 'USA')
+	]
+)
+def test_extract_one(index, query, expected):
+	label, score, key = index.extract_one(query)
+	assert key == expected
+
+
+def test_search_respects_cutoff_and_limit(index):
+	assert index.extract_one('Atlantis', score_cutoff = 95) is None
+	assert index.extract_one('') is None
+
+	results = index.search('united', limit = 2)
+	assert len(results) == 2
+	assert {i[2] for i in results} == {'GBR', 'USA'}
+	assert results[0][1] >= results[1][1]
+
+
+def test_labels_can_share_keys():
+	index = FuzzyIndex(['Great Britain', 'United Kingdom', 'France'], ['GBR', 'GBR', 'FRA'])
+	assert index.extract_one('great britain')[2] == 'GBR'
+	assert index.extract_one('united kingdom')[2] == 'GBR'
+	assert len(index) == 3
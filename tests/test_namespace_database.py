@@ -3,6 +3,7 @@ import pytest
 import importlib
 from pony.orm import db_session
 import math
+import pandas
 from loguru import logger
 
 
@@ -157,3 +158,170 @@ def test_namespace_database_import_usps_add_regions(empty_namespace):
 )
 def test_is_valid_code(value, expected):
 	assert ndb.is_valid_code(value) == expected
+
+
+def test_resolve_codes(namespace_database):
+	with db_session:
+		result = namespace_database.resolve_codes("testNamespace", ["usa", "FRA", "DEU", math.nan])
+		assert sorted(result) == ["FRA", "usa"]
+		assert result["usa"].name == "United States"
+		assert namespace_database.resolve_codes("otherNamespace", ["USA"]) == {}
+
+
+def test_resolve_codes_with_more_codes_than_sqlite_parameters(namespace_database):
+	values = [f"X{i}" for i in range(2000)] + ["FRA"]
+	with db_session:
+		assert list(namespace_database.resolve_codes("testNamespace", values)) == ["FRA"]
+
+
+def test_resolve_region_ids(namespace_database):
+	with db_session:
+		usa = namespace_database.get_region_from_code("USA", "testNamespace").id
+		fra = namespace_database.get_region_from_code("FRA", "testNamespace").id
+	values = pandas.Series(["usa", "FRA", "DEU", math.nan, "FRA"], index = list("abcde"))
+	result = namespace_database.resolve_region_ids("testNamespace", values)
+	assert result.index.tolist() == list("abcde")
+	assert result.dtype == "Int64"
+	assert result[["a", "b", "e"]].tolist() == [usa, fra, fra]
+	assert result[["c", "d"]].isna().all()
+
+
+def test_code_snapshot_can_be_refreshed(namespace_database):
+	assert "DEU" not in namespace_database.code_snapshot["testNamespace"]
+	with db_session:
+		namespace = namespace_database.get_namespace("testNamespace")
+		region = namespace_database.import_region("Germany", "country")
+		namespace_database.import_namespace_code(namespace, region, "deu")
+	assert "DEU" in namespace_database.code_snapshot["testNamespace"]
+
+
+@pytest.fixture
+def region_table() -> pandas.DataFrame:
+	return pandas.DataFrame({
+		'regionName': ['Germany', 'France', 'Atlantis', math.nan],
+		'regionType': ['country', 'country', 'territory', 'country'],
+		'iso2':       ['DE', 'fr', math.nan, 'XX'],
+		'iso3':       ['DEU', 'FRA', 'ATL', 'XXX']
+	})
+
+
+def test_import_namespace_table(empty_namespace, region_table):
+	namespaces = {'iso2': ndb.NAMESPACE_ISO2, 'iso3': ndb.NAMESPACE_ISO3}
+	result = empty_namespace.import_namespace_table(region_table, namespaces)
+	assert result == {'regions': 3, 'codes': 5}
+
+	with db_session:
+		assert empty_namespace.get_code("ISO 3166-1 alpha-2", "fr").region.name == "France"
+		assert empty_namespace.get_code("ISO 3166-1 alpha-3", "ATL").region.type == "territory"
+		assert empty_namespace.get_region_from_code("DEU", "ISO 3166-1 alpha-3").aliases == ["Germany"]
+		assert empty_namespace.Region.select().count() == 3
+
+
+def test_import_namespace_table_upsert_is_idempotent(empty_namespace, region_table):
+	namespaces = {'iso3': ndb.NAMESPACE_ISO3}
+	empty_namespace.import_namespace_table(region_table, namespaces)
+	region_table['regionType'] = 'region'
+	empty_namespace.import_namespace_table(region_table, namespaces)
+
+	with db_session:
+		assert empty_namespace.Namespace.select().count() == 1
+		assert empty_namespace.Region.select().count() == 3
+		assert empty_namespace.Code.select().count() == 3
+		assert empty_namespace.get_region_from_code("FRA", "ISO 3166-1 alpha-3").type == "region"
+
+	with pytest.raises(Exception):
+		empty_namespace.import_namespace_table(region_table, namespaces, upsert = False)
+
+
+def test_import_namespace_table_upsert_merges_aliases(empty_namespace, region_table):
+	namespaces = {'iso3': ndb.NAMESPACE_ISO3}
+	region_table['aliases'] = ['Deutschland', math.nan, '', math.nan]
+	empty_namespace.import_namespace_table(region_table, namespaces, alias_column = 'aliases')
+	region_table['aliases'] = [['Allemagne', 'Deutschland'], 'La France|Hexagone', math.nan, math.nan]
+	empty_namespace.import_namespace_table(region_table, namespaces, alias_column = 'aliases')
+	empty_namespace.import_namespace_table(region_table, namespaces, alias_column = 'aliases')
+
+	with db_session:
+		assert empty_namespace.Region.get(name = "Germany").aliases == ["Germany", "Deutschland", "Allemagne"]
+		assert empty_namespace.Region.get(name = "France").aliases == ["France", "La France", "Hexagone"]
+		assert empty_namespace.Region.get(name = "Atlantis").aliases == ["Atlantis"]
+
+
+def test_import_namespace_table_never_makes_a_region_its_own_parent(empty_namespace, region_table):
+	empty_namespace.import_namespace_table(region_table, {'iso3': ndb.NAMESPACE_ISO3})
+	with db_session:
+		germany = empty_namespace.Region.get(name = "Germany").id
+	empty_namespace.import_namespace_table(region_table, {'iso3': ndb.NAMESPACE_ISO3}, parent = germany)
+
+	with db_session:
+		assert empty_namespace.Region.get(name = "Germany").parent is None
+		assert empty_namespace.Region.get(name = "France").parent.name == "Germany"
+
+
+def test_import_namespace_table_with_parent(empty_namespace, region_table):
+	with db_session:
+		parent = empty_namespace.import_region("Europe", "continent")
+	empty_namespace.import_namespace_table(region_table, {'iso3': ndb.NAMESPACE_ISO3}, parent = parent.id)
+
+	with db_session:
+		region = empty_namespace.get_region_from_code("DEU", "ISO 3166-1 alpha-3")
+		assert region.parent.name == "Europe"
+		assert len(empty_namespace.Region.get(name = "Europe").subregions) == 3
+
+
+@pytest.fixture
+def region_tree(empty_namespace) -> ndb.NamespaceDatabase:
+	with db_session:
+		europe = empty_namespace.import_region("Europe", "continent")
+		germany = empty_namespace.import_region("Germany", "country")
+		bavaria = empty_namespace.import_region("Bavaria", "state")
+		munich = empty_namespace.import_region("Munich", "city")
+		empty_namespace.import_region("United States", "country")
+		germany.parent = europe
+		bavaria.parent = germany
+		munich.parent = bavaria
+	empty_namespace.rebuild_closure()
+	return empty_namespace
+
+
+def _names(regions):
+	return [region.name for region in regions]
+
+
+def test_rebuild_closure(region_tree):
+	# Each region is its own ancestor, plus 3 + 2 + 1 links in the european chain.
+	assert region_tree.rebuild_closure() == 5 + 6
+
+
+def test_descendants(region_tree):
+	with db_session:
+		europe = region_tree.Region.get(name = "Europe")
+		assert _names(region_tree.descendants(europe)) == ["Germany", "Bavaria", "Munich"]
+		assert _names(region_tree.descendants(europe.id, include_self = True)) == ["Europe", "Germany", "Bavaria", "Munich"]
+		assert region_tree.descendants(region_tree.Region.get(name = "United States")) == []
+
+
+def test_ancestors(region_tree):
+	with db_session:
+		munich = region_tree.Region.get(name = "Munich")
+		assert _names(region_tree.ancestors(munich)) == ["Bavaria", "Germany", "Europe"]
+		assert _names(region_tree.ancestors(munich, include_self = True))[0] == "Munich"
+
+
+def test_is_within(region_tree):
+	with db_session:
+		europe = region_tree.Region.get(name = "Europe")
+		munich = region_tree.Region.get(name = "Munich")
+		usa = region_tree.Region.get(name = "United States")
+		assert region_tree.is_within(munich, europe)
+		assert region_tree.is_within(europe, europe)
+		assert not region_tree.is_within(europe, munich)
+		assert not region_tree.is_within(munich, usa)
+
+
+def test_import_namespace_table_updates_closure(empty_namespace, region_table):
+	with db_session:
+		parent = empty_namespace.import_region("Europe", "continent")
+	empty_namespace.import_namespace_table(region_table, {'iso3': ndb.NAMESPACE_ISO3}, parent = parent.id)
+	with db_session:
+		assert len(empty_namespace.descendants(parent.id)) == 3
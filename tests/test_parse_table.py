@@ -1,3 +1,6 @@
+import math
+
+import pandas
 import pytest
 
 from pyregions import standard_definition
@@ -60,3 +63,28 @@ def test_convert_row_to_standard_series_using_custom_column_names(columnmap):
 	result = parse_table._convert_table_row_to_standard_series(data, columnmap)
 	assert expected == result
 
+
+def test_convert_table_to_standard_series_matches_row_conversion(columnmap):
+	rows = [
+		{
+			'regionCode':        'PRI', 'seriesCode': 'LP', 'regionName': 'Puerto Rico', 'seriesName': 'Population',
+			'seriesDescription': 'standardDescription', 'seriesNotes': 'note',
+			'seriesUnits':       'Persons', 'seriesScale': 'Millions', '1980': 3.2, '1981': '3.22', '1982': 'n/a'
+		},
+		{
+			'regionCode':        'USA', 'seriesCode': 'NGDP', 'regionName': 'United States', 'seriesName': 'GDP',
+			'seriesDescription': 'standardDescription', 'seriesNotes': '',
+			'seriesUnits':       'Dollars', 'seriesScale': 'Billions', '1980': '2,857.31', '1981': 3207.03, '1982': 3343.79
+		}
+	]
+	table = pandas.DataFrame(rows)
+
+	result = parse_table._convert_table_to_standard_series(table, columnmap)
+
+	assert [i.region_code for i in result] == ['PRI', 'USA']
+	assert [i.scale for i in result] == ['mega', 'giga']
+	assert result[0].values[:2] == [(1980, 3.2), (1981, 3.22)]
+	assert math.isnan(result[0].values[2][1])
+	assert result[1].values == [(1980, 2857.31), (1981, 3207.03), (1982, 3343.79)]
+	assert result[1].notes == ''
+	assert result[1].tags == []
@@ -1,5 +1,8 @@
+import math
+import sqlite3
 import pytest
 from pyregions.database.ponydatabase import sql_entities, region_database as rdb
+from pyregions.database.entity_cache import EntityCache
 from pyregions import standard_definition as sd
 from pony.orm import db_session
 import datetime
@@ -102,6 +105,18 @@ def test_regions_can_be_added_to_the_database_if_some_already_exist(empty_databa
 		assert empty_database.Region.get(code = 'TE2').name == 'testregion2a'
 		assert empty_database.Region.get(name = 'testregion3') is not None
 
+def test_import_regions_skips_duplicate_codes(empty_database):
+	test_regions = [
+		sd.StandardRegion('TE1', 'testregion1', 'testregion'),
+		sd.StandardRegion('TE1', 'testregion1b', 'testregion'),
+		sd.StandardRegion(math.nan, 'testregion2', 'testregion')
+	]
+	assert empty_database.import_regions(test_regions) == 1
+	assert empty_database.import_regions(test_regions) == 0
+	with db_session:
+		assert empty_database.Region.get(code = 'TE1').name == 'testregion1'
+		assert empty_database.Region.select().count() == 1
+
 def test_add_scales_to_database(empty_database):
 	with db_session:
 		empty_database.add_scales()
@@ -191,4 +206,223 @@ def test_add_usps_codes_to_database(empty_database):
 		empty_database.add_namespace_usps()
 
 		assert empty_database.Region.get(code = 'USA-NY') is not None
-		assert empty_database.Region.get(code = 'USA-PR') is not None
\ No newline at end of file
+		assert empty_database.Region.get(code = 'USA-PR') is not None
+@pytest.fixture
+def standard_data():
+	report = sd.StandardReport(
+		date = datetime.datetime(2018, 4, 1),
+		name = 'World Economic Outlook',
+		url = 'http://www.somewebsite.com',
+		agency = 'International Monetary Fund'
+	)
+	series = [
+		sd.StandardSeries(
+			region_name = 'testregion1', region_code = 'TEST1', series_name = 'Population', series_code = 'LP',
+			scale = 'mega', description = 'description', notes = float('nan'), units = 'Persons', tags = ['tag1', 'tag3'],
+			values = [(2000, 1.5), (2001, 2.5)]
+		),
+		sd.StandardSeries(
+			region_name = 'testregion2', region_code = 'TEST2', series_name = 'Population', series_code = 'LP',
+			scale = 'mega', description = 'description', notes = 'notes', units = 'Persons', tags = [],
+			values = [(2000, 3.5), (2001, float('nan'))]
+		)
+	]
+	return report, series
+
+def test_import_standard_data(region_database, standard_data):
+	report, series = standard_data
+	assert region_database.import_standard_data(report, series) == 2
+
+	with db_session:
+		result = region_database.get_series('TEST1', 'World Economic Outlook', 'LP')
+		assert result.years == [2000, 2001]
+		assert result.values == [1.5, 2.5]
+		assert result.notes == ''
+		assert sorted(i.value for i in result.tags) == ['tag1', 'tag3']
+		assert region_database.get_report('World Economic Outlook').date == datetime.datetime(2018, 4, 1)
+
+		result = region_database.get_series('TEST2', 'World Economic Outlook', 'LP')
+		assert result.values[0] == 3.5
+		assert result.load().data.index.tolist() == [2000, 2001]
+
+def test_import_standard_data_inside_a_session(region_database, standard_data):
+	report, series = standard_data
+	with db_session:
+		region_database.Region(code = 'TEST3', name = 'testregion3', type = 'testregion')
+		series[0].region_code = 'TEST3'
+		assert region_database.import_standard_data(report, series) == 2
+
+	with db_session:
+		assert region_database.Region.get(code = 'TEST3') is not None
+		assert region_database.get_series('TEST3', 'World Economic Outlook', 'LP') is not None
+
+def test_import_standard_data_updates_the_report(region_database, standard_data):
+	report, series = standard_data
+	region_database.import_standard_data(report, series[:1])
+	report.url = 'http://www.anotherwebsite.com'
+	report.date = datetime.datetime(2019, 4, 1)
+	region_database.import_standard_data(report, series[1:])
+
+	with db_session:
+		result = region_database.Report.get(name = 'World Economic Outlook')
+		assert result.url == 'http://www.anotherwebsite.com'
+		assert result.date == datetime.datetime(2019, 4, 1)
+
+def test_import_standard_data_requires_existing_regions(region_database, standard_data):
+	report, series = standard_data
+	series[0].region_code = 'TEST3'
+	with pytest.raises(ValueError):
+		region_database.import_standard_data(report, series)
+
+	with db_session:
+		assert region_database.get_report('World Economic Outlook') is None
+
+def test_check_regions(region_database):
+	labels = ['TEST1', 'TEST3', 'TEST2', 'TEST3', 'TEST4']
+	assert region_database.check_regions(labels) == ['TEST3', 'TEST4']
+	assert region_database.check_regions(['testregion1', 'TEST1'], by_code = False) == ['TEST1']
+
+def test_check_regions_with_more_labels_than_sqlite_parameters(region_database):
+	labels = [f'MISSING{i}' for i in range(2500)] + ['TEST1']
+	assert region_database.check_regions(labels) == labels[:-1]
+
+def test_check_scales(region_database):
+	assert region_database.check_scales(['kilo', 'abc', 'mega', 'abc']) == ['abc']
+
+def test_import_standard_data_compact(region_database, standard_data):
+	report, series = standard_data
+	region_database.compact = True
+	region_database.import_standard_data(report, series)
+
+	with db_session:
+		result = region_database.get_series('TEST2', 'World Economic Outlook', 'LP')
+		assert result.years == []
+		data = result.load().data
+	assert data.index.tolist() == [2000, 2001]
+	assert data.iloc[0] == 3.5
+	assert math.isnan(data.iloc[1])
+
+def test_migrate_series_storage(region_database, standard_data):
+	report, series = standard_data
+	region_database.import_standard_data(report, series)
+	with db_session:
+		count = region_database.Series.select().count()
+	assert region_database.migrate_series_storage() == count
+	assert region_database.migrate_series_storage() == 0
+
+	with db_session:
+		result = region_database.get_series('TEST1', 'World Economic Outlook', 'LP')
+		assert result.values == []
+		assert result.load().data.tolist() == [1.5, 2.5]
+
+def test_upgrade_schema_adds_packed_column(tmp_path):
+	filename = str(tmp_path / "old_database.sqlite")
+	connection = sqlite3.connect(filename)
+	connection.execute('CREATE TABLE "Series" ("code" TEXT, "years" INT[], "values" REAL[])')
+	connection.commit()
+	connection.close()
+
+	rdb._upgrade_schema(filename)
+	connection = sqlite3.connect(filename)
+	assert rdb._get_columns(connection, 'Series') == ['code', 'years', 'values', 'packed']
+	connection.close()
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_get_panel(region_database, standard_data, compact):
+	report, series = standard_data
+	series[1].values = [(2001, 4.5), (2002, 5.5)]
+	region_database.compact = compact
+	region_database.import_standard_data(report, series)
+
+	panel = region_database.get_panel('World Economic Outlook')
+	assert panel.index.names == ['regionCode', 'seriesCode']
+	assert panel.index.tolist() == [('TEST1', 'LP'), ('TEST2', 'LP')]
+	assert panel.columns.tolist() == [2000, 2001, 2002]
+	assert panel.loc[('TEST1', 'LP'), 2001] == 2.5
+	assert math.isnan(panel.loc[('TEST2', 'LP'), 2000])
+	assert panel.loc[('TEST2', 'LP'), 2002] == 5.5
+
+def test_get_panel_with_filters(region_database, standard_data):
+	report, series = standard_data
+	region_database.import_standard_data(report, series)
+
+	panel = region_database.get_panel('World Economic Outlook', 'LP', regions = ['TEST2'], years = [2000])
+	assert panel.index.name == 'regionCode'
+	assert panel.index.tolist() == ['TEST2']
+	assert panel.columns.tolist() == [2000]
+	assert panel.loc['TEST2', 2000] == 3.5
+
+	assert region_database.get_panel('World Economic Outlook', ['XX']).empty
+	assert region_database.get_panel('missing report').empty
+
+def test_cached_getters(region_database):
+	region_database.cache = EntityCache()
+	with db_session:
+		first = region_database.get_region('TEST1')
+		assert region_database.get_region('TEST1') is first
+		assert region_database.get_region('TEST3') is None
+		assert region_database.get_region('TEST3') is None
+	# Missing entities are not cached.
+	assert region_database.cache_info()['hits'] == 1
+	assert region_database.cache_info()['misses'] == 3
+
+	# Entities from a previous session can not be reused.
+	with db_session:
+		assert region_database.get_region('TEST1').name == 'testregion1'
+	assert region_database.cache_info()['misses'] == 4
+
+def test_cache_finds_regions_added_through_the_entities(region_database):
+	region_database.cache = EntityCache()
+	with db_session:
+		assert region_database.get_region('TEST3') is None
+		region_database.Region(code = 'TEST3', name = 'testregion3', type = 'testregion')
+		assert region_database.get_region('TEST3').name == 'testregion3'
+
+def test_is_session_entity(region_database):
+	# Fails if pony changes the internals used to detect entities from an earlier session.
+	assert hasattr(sql_entities.Region, '_session_cache_')
+	assert hasattr(region_database.database, '_get_cache')
+	with db_session:
+		region = region_database.Region.get(code = 'TEST1')
+		assert rdb._is_session_entity(region_database.database, region)
+	with db_session:
+		assert not rdb._is_session_entity(region_database.database, region)
+
+def test_cache_is_invalidated_by_imports(region_database):
+	region_database.cache = EntityCache()
+	with db_session:
+		assert region_database.get_region('TEST3') is None
+
+	region_database.import_regions([sd.StandardRegion('TEST3', 'testregion3', 'testregion')])
+	with db_session:
+		assert region_database.get_region('TEST3').name == 'testregion3'
+
+def test_getters_use_indexes(region_database):
+	plans = region_database.explain_queries(show = False)
+	assert 'series by code' in plans
+	for name, steps in plans.items():
+		assert not any(step.startswith('SCAN') for step in steps), (name, steps)
+
+def test_get_cross_section(region_database, standard_data):
+	report, series = standard_data
+	region_database.store_observations = True
+	region_database.import_standard_data(report, series)
+
+	table = region_database.get_cross_section('World Economic Outlook', 2000)
+	assert table.to_dict() == {'LP': {'TEST1': 1.5, 'TEST2': 3.5}}
+
+	# Missing values are not stored.
+	result = region_database.get_cross_section('World Economic Outlook', 2001, 'LP')
+	assert result.to_dict() == {'TEST1': 2.5}
+	assert region_database.get_cross_section('World Economic Outlook', 1990, ['LP']).empty
+
+def test_build_observations(region_database, standard_data):
+	report, series = standard_data
+	region_database.compact = True
+	region_database.import_standard_data(report, series)
+	assert region_database.get_cross_section('World Economic Outlook', 2000).empty
+
+	assert region_database.build_observations('World Economic Outlook') == 3
+	assert region_database.build_observations('World Economic Outlook') == 0
+	result = region_database.get_cross_section('World Economic Outlook', 2000, 'LP')
+	assert result.to_dict() == {'TEST1': 1.5, 'TEST2': 3.5}
@@ -1,4 +1,5 @@
-from pyregions.geotools.region_identifier import identify
+from pyregions.geotools.region_identifier import RegionResolver, identify
+import pandas
 import pytest
 
 @pytest.mark.parametrize(
@@ -17,4 +18,61 @@ def test_identifier(string):
 		'regionCode': 'GBR'
 	}
 	result = identify(string)
-	assert result == expected_result
\ No newline at end of file
+	assert result == expected_result
+
+@pytest.fixture
+def resolver(tmp_path) -> RegionResolver:
+	folder = tmp_path / "namespaces"
+	folder.mkdir()
+	(folder / "iso2.yaml").write_text(
+		"name: iso2\n"
+		"regionMap:\n"
+		"  gbr: {regionCode: GB, regionName: United Kingdom}\n"
+		"  fra: {regionCode: FR, regionName: France}\n"
+	)
+	(folder / "iso3.yaml").write_text(
+		"name: iso3\n"
+		"regionMap:\n"
+		"  gbr: {regionCode: GBR, regionName: United Kingdom}\n"
+		"  fra: {regionCode: FRA, regionName: France}\n"
+	)
+	aliases = tmp_path / "region_aliases.tsv"
+	aliases.write_text("regionCode\tregionName\ngbr\tGreat Britain\nfra\tFrench Republic\n")
+
+	return RegionResolver(folder, aliases)
+
+
+@pytest.mark.parametrize(
+	"string,namespace,expected",
+	[
+		('GB', None, 'GBR'),
+		('fra', None, 'FRA'),
+		('United Kingdom', 'iso3', 'GBR'),
+		('FR', 'iso2', 'FRA'),
+		('great britain', None, 'GBR')
+	]
+)
+def test_resolver_identify(resolver, string, namespace, expected):
+	assert resolver.identify(string, namespace)['regionCode'] == expected
+
+
+def test_resolver_identify_respects_namespace(resolver):
+	assert resolver.identify('FR', 'iso3') is None
+	assert resolver.identify('fra', 'iso3') == {'regionName': 'france', 'regionCode': 'FRA'}
+
+
+def test_resolver_identify_many(resolver):
+	values = pandas.Series(['GB', 'fra', None, 'GB', 'Atlantis'], index = [10, 11, 12, 13, 14])
+	result = resolver.identify_many(values)
+
+	assert list(result.columns) == ['regionName', 'regionCode']
+	assert result.index.tolist() == [10, 11, 12, 13, 14]
+	assert result['regionCode'].tolist()[:2] == ['GBR', 'FRA']
+	assert result.loc[13, 'regionCode'] == 'GBR'
+	assert result.loc[[12, 14], 'regionCode'].isna().all()
+
+
+def test_resolver_identify_many_checks_the_classified_namespace_first(resolver):
+	values = pandas.Series(['FR', 'FRA', 'France'])
+	result = resolver.identify_many(values)
+	assert result['regionCode'].tolist() == ['FRA', 'FRA', 'FRA']
@@ -0,0 +1,43 @@
+import math
+
+import numpy
+import pytest
+
+from pyregions.database import series_encoding
+
+
+@pytest.mark.parametrize(
+	"years",
+	[
+		[2000, 2001, 2002],
+		[1990, 1995, 2000, 2005],
+		[2000, 2001, 2005],
+		[2010],
+		[]
+	]
+)
+def test_pack_and_unpack_series(years):
+	values = [float(i) * 1.5 for i in range(len(years))]
+	years_result, values_result = series_encoding.unpack_series(series_encoding.pack_series(years, values))
+	assert years_result.tolist() == years
+	assert values_result.tolist() == values
+
+def test_regular_series_do_not_store_years():
+	regular = series_encoding.pack_series([2000, 2001, 2002], [1.0, 2.0, 3.0])
+	irregular = series_encoding.pack_series([2000, 2001, 2003], [1.0, 2.0, 3.0])
+	assert len(regular) == series_encoding.HEADER.size + 3 * 8
+	assert len(irregular) == series_encoding.HEADER.size + 3 * 4 + 3 * 8
+
+def test_unpack_series_keeps_missing_values():
+	years, values = series_encoding.unpack_series(series_encoding.pack_series(numpy.arange(2000, 2003), [1.0, math.nan, 3.0]))
+	assert math.isnan(values[1])
+
+def test_pack_series_requires_matching_lengths():
+	with pytest.raises(ValueError):
+		series_encoding.pack_series([2000, 2001], [1.0])
+
+def test_unpack_series_rejects_unknown_versions():
+	blob = bytearray(series_encoding.pack_series([2000], [1.0]))
+	blob[0] = 99
+	with pytest.raises(ValueError):
+		series_encoding.unpack_series(bytes(blob))
@@ -0,0 +1,126 @@
+import datetime
+import math
+
+import pytest
+
+from pyregions import standard_definition as sd
+from pyregions.database.sqlalchemydatabase import region_database as sadb
+
+
+@pytest.fixture
+def database(tmp_path) -> sadb.BaseDatabase:
+	database = sadb.BaseDatabase(tmp_path / "region_database.sqlite")
+	database.add_scales()
+	database.import_regions([
+		sd.StandardRegion('TEST1', 'testregion1', 'testregion'),
+		sd.StandardRegion('TEST2', 'testregion2', 'testregion')
+	])
+	return database
+
+
+@pytest.fixture
+def standard_data():
+	report = sd.StandardReport(
+		date = datetime.datetime(2018, 4, 1),
+		name = 'World Economic Outlook',
+		url = 'http://www.somewebsite.com',
+		agency = 'International Monetary Fund'
+	)
+	series = [
+		sd.StandardSeries(
+			region_name = 'testregion1', region_code = 'TEST1', series_name = 'Population', series_code = 'LP',
+			scale = 'mega', description = 'description', notes = float('nan'), units = 'Persons', tags = ['tag1', 'tag3'],
+			values = [(2000, 1.5), (2001, 2.5)]
+		),
+		sd.StandardSeries(
+			region_name = 'testregion2', region_code = 'TEST2', series_name = 'Population', series_code = 'LP',
+			scale = 'mega', description = 'description', notes = 'notes', units = 'Persons', tags = 'tag1',
+			values = [(2000, 3.5), (2001, float('nan'))]
+		)
+	]
+	return report, series
+
+
+def test_import_regions(database):
+	assert database.get_region('TEST1').name == 'testregion1'
+	assert database.get_region('TEST3') is None
+	regions = [sd.StandardRegion('TEST1', 'other', 'testregion'), sd.StandardRegion('TEST3', 'testregion3', 'testregion')]
+	assert database.import_regions(regions) == 1
+	assert database.get_region('TEST1').name == 'testregion1'
+	assert database.get_region('TEST3').name == 'testregion3'
+
+def test_add_scales(database):
+	assert database.add_scales() == 0
+	assert database.get_scale('kilo').multiplier == 1000
+
+def test_import_standard_data(database, standard_data):
+	report, series = standard_data
+	assert database.import_standard_data(report, series) == 2
+	assert database.get_report('World Economic Outlook')['agency'] == 'International Monetary Fund'
+
+	result = database.get_series('TEST1', 'World Economic Outlook', 'LP')
+	assert result.primarykey == ('World Economic Outlook', 'TEST1', 'LP')
+	assert result.region.name == 'testregion1'
+	assert result.notes is None
+	assert result.tags == ['tag1', 'tag3']
+	assert result.data.to_dict() == {2000: 1.5, 2001: 2.5}
+
+	result = database.get_series('TEST2', 'World Economic Outlook', 'LP')
+	assert result.tags == ['tag1']
+	assert math.isnan(result.data[2001])
+
+def test_import_standard_data_updates_the_report(database, standard_data):
+	report, series = standard_data
+	database.import_standard_data(report, series[:1])
+	report.date = datetime.datetime(2019, 4, 1)
+	report.url = 'http://www.anotherwebsite.com'
+	report.agency = 'World Bank'
+	database.import_standard_data(report, series[1:])
+
+	result = database.get_report('World Economic Outlook')
+	assert result['date'] == datetime.date(2019, 4, 1)
+	assert result['url'] == 'http://www.anotherwebsite.com'
+	assert result['agency'] == 'World Bank'
+	assert len(list(database.iter_series('World Economic Outlook'))) == 2
+
+def test_import_standard_data_requires_existing_regions(database, standard_data):
+	report, series = standard_data
+	series[0].region_code = 'TEST3'
+	with pytest.raises(ValueError):
+		database.import_standard_data(report, series)
+	assert database.get_report('World Economic Outlook') is None
+
+def test_iter_series_in_batches(database):
+	regions = [sd.StandardRegion(f'R{i}', f'region{i}', 'country') for i in range(30)]
+	database.import_regions(regions)
+	report = sd.StandardReport(datetime.datetime(2018, 4, 1), 'report', 'url', 'agency')
+	series = [
+		sd.StandardSeries(region.name, region.code, 'name', code, 'unit', '', '', 'units', [f'tag{index}'], [(2000, index)])
+		for index, region in enumerate(regions) for code in ['A', 'B']
+	]
+	database.import_standard_data(report, series)
+
+	result = list(database.iter_series('report', batch_size = 7))
+	assert len(result) == 60
+	assert all(item.tags == [f'tag{item.data[2000]:.0f}'] for item in result)
+	assert len(list(database.iter_series(codes = ['A'], regions = ['R1', 'R2']))) == 2
+
+	# Filters longer than sqlite's parameter limit are split into several queries.
+	codes = ['A'] + [f'X{i}' for i in range(2000)]
+	regions = [region.code for region in regions] + [f'Y{i}' for i in range(2000)]
+	assert len(list(database.iter_series('report', codes = codes, regions = regions))) == 30
+
+def test_get_cross_section(database, standard_data):
+	report, series = standard_data
+	database.store_observations = True
+	database.import_standard_data(report, series)
+
+	table = database.get_cross_section('World Economic Outlook', 2000)
+	assert table.to_dict() == {'LP': {'TEST1': 1.5, 'TEST2': 3.5}}
+	result = database.get_cross_section('World Economic Outlook', 2001, 'LP')
+	assert result.to_dict() == {'TEST1': 2.5}
+	assert database.get_cross_section('World Economic Outlook', 1990, ['LP']).empty
+
+	codes = [f'X{i}' for i in range(2000)] + ['LP']
+	table = database.get_cross_section('World Economic Outlook', 2000, codes)
+	assert table.to_dict() == {'LP': {'TEST1': 1.5, 'TEST2': 3.5}}
@@ -1,3 +1,6 @@
+from typing import List
+
+import numpy
 import pytest
 from pyregions import standard_definition
 
@@ -38,4 +41,82 @@ def test_required_columns_using_custom_column_names(default_required_columns):
 	]
 
 	with pytest.raises(ValueError):
-		default_required_columns.find_missing_columns(wrong_columns)
\ No newline at end of file
+		default_required_columns.find_missing_columns(wrong_columns)
+
+@pytest.fixture
+def standard_series() -> List[standard_definition.StandardSeries]:
+	series1 = standard_definition.StandardSeries(
+		region_name = 'Puerto Rico', region_code = 'PRI', series_name = 'Population', series_code = 'LP',
+		scale = 'mega', description = '', notes = '', units = 'Persons', tags = [],
+		values = [(1980, 3.2), (1981, 3.22)]
+	)
+	series2 = standard_definition.StandardSeries(
+		region_name = 'Canada', region_code = 'CAN', series_name = 'Population', series_code = 'LP',
+		scale = 'mega', description = '', notes = 'note', units = 'Persons', tags = ['tag1'],
+		values = [(1981, 24.7), (1982, 25.1)]
+	)
+	return [series1, series2]
+
+
+def test_standard_table_from_series(standard_series):
+	table = standard_definition.StandardTable.from_series(standard_series)
+
+	assert len(table) == 2
+	assert table.years.tolist() == [1980, 1981, 1982]
+	assert table.values.shape == (2, 3)
+	assert table.values.dtype == numpy.float64
+	assert numpy.isnan(table.values[0, 2])
+	assert table.metadata['region_code'].tolist() == ['PRI', 'CAN']
+
+	# Only the missing timepoints should be dropped when converting back.
+	assert table.to_series(dropna = True) == standard_series
+
+
+def test_standard_table_views(standard_series):
+	table = standard_definition.StandardTable.from_series(standard_series)
+	views = list(table)
+
+	assert [i.region_code for i in views] == ['PRI', 'CAN']
+	assert views[1].notes == 'note'
+	assert views[1].tags == ['tag1']
+	assert views[1].values[1:] == [(1981, 24.7), (1982, 25.1)]
+	assert table[0].to_series().series_code == 'LP'
+
+
+def test_standard_table_checks_the_value_shape(standard_series):
+	metadata = standard_definition.StandardTable.from_series(standard_series).metadata
+	with pytest.raises(ValueError):
+		standard_definition.StandardTable(metadata, [1980, 1981], numpy.zeros((2, 3)))
+
+
+def test_standard_table_to_frame(standard_series):
+	frame = standard_definition.StandardTable.from_series(standard_series).to_frame()
+	assert list(frame.columns) == standard_definition.SERIES_METADATA + [1980, 1981, 1982]
+	assert frame.loc[1, 1982] == 25.1
+
+
+def test_standard_series_to_row(standard_series):
+	row = standard_series[0].to_row()
+	assert row['region_code'] == 'PRI'
+	assert row[1980] == 3.2
+	assert row[1981] == 3.22
+	assert 'values' not in row
+
+
+def test_standard_entities_do_not_have_a_dict(standard_series):
+	region = standard_definition.StandardRegion('PRI', 'Puerto Rico', 'territory')
+	assert not hasattr(region, '__dict__')
+	assert not hasattr(standard_series[0], '__dict__')
+
+
+def test_compact_series(standard_series):
+	series = standard_series[1]
+	compact = standard_definition.CompactSeries.from_series(series)
+
+	assert not hasattr(compact, '__dict__')
+	assert compact.years.tolist() == [1981, 1982]
+	assert compact.values == series.values
+	assert compact.to_dict() == series.to_dict()
+	assert compact.to_row() == series.to_row()
+	assert compact == series
+	assert compact.to_series() == series